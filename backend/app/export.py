@@ -1,40 +1,118 @@
 # backend/app/export.py
 import pandas as pd
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.formatting.rule import FormulaRule
 from pathlib import Path
+import csv
+import os
 import logging
-from typing import Tuple
 
 logger = logging.getLogger(__name__)
 
-def export_to_files(df: pd.DataFrame, session_id: str, temp_dir: Path) -> Tuple[str, str]:
+# Excel styles - built once and shared by every cell instead of per cell
+HEADER_FONT = Font(name='Arial', size=12, bold=True, color='FFFFFF')
+HEADER_FILL = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+
+DATA_FONT = Font(name='Arial', size=11)
+DATA_ALIGNMENT = Alignment(horizontal='left', vertical='center')
+AMOUNT_ALIGNMENT = Alignment(horizontal='right', vertical='center')
+ALT_ROW_FILL = PatternFill(start_color='F8F9FA', end_color='F8F9FA', fill_type='solid')
+
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+XLSX_SIGNATURE = b'PK\x03\x04'  # Local file header of a ZIP archive
+
+AMOUNT_FORMAT = '£#,##0.00'
+AMOUNT_COLUMNS = (2, 3, 4)  # Debit, Credit, Balance (0-based)
+
+# Named style per column kind (is amount) - cells only need a name lookup
+HEADER_STYLE = 'header'
+CELL_STYLES = {
+    False: 'text',
+    True: 'amount',
+}
+
+# Every other data row is shaded by one conditional formatting rule rather than per-cell fills
+ALT_ROW_FORMULA = 'MOD(ROW(),2)=1'
+
+# CSV export streams through a 1 MiB buffer, formatting this many rows at a time
+CSV_BUFFER_SIZE = 1 << 20
+CSV_CHUNK_ROWS = 10000
+
+# XLSX writer backend: 'openpyxl' (default) or 'xlsxwriter' for constant-memory output
+XLSX_ENGINE = os.environ.get("XLSX_ENGINE", "openpyxl").lower()
+
+COLUMN_WIDTHS = {
+    'A': 12,  # Date
+    'B': 40,  # Description
+    'C': 15,  # Debit
+    'D': 15,  # Credit
+    'E': 15,  # Balance
+}
+
+def export_to_files(df: pd.DataFrame, session_id: str, temp_dir: Path) -> str:
     """
-    Export DataFrame to both Excel and CSV formats
+    Export DataFrame to CSV, returning its path
+    
+    The Excel workbook is the slower format to write, so it is only built from this CSV
+    when it is first downloaded (see export_excel_from_csv)
     """
     try:
         # Prepare data for export
         export_df = prepare_data_for_export(df)
         
-        # Generate file paths
-        excel_path = temp_dir / f"{session_id}_transactions.xlsx"
         csv_path = temp_dir / f"{session_id}_transactions.csv"
         
-        # Export to Excel with formatting
-        export_to_excel(export_df, str(excel_path))
-        
         # Export to CSV
         export_to_csv(export_df, str(csv_path))
         
-        logger.info(f"Successfully exported {len(export_df)} transactions to Excel and CSV")
+        logger.info(f"Successfully exported {len(export_df)} transactions to CSV")
         
-        return str(excel_path), str(csv_path)
+        return str(csv_path)
         
     except Exception as e:
         logger.error(f"Error exporting files: {str(e)}")
         raise
 
+def export_excel_from_csv(csv_path: str, excel_path: str):
+    """
+    Build the Excel workbook from a session's exported CSV
+    
+    It is written under a per-process name and then moved into place, so a download
+    never sees a half-written workbook even when two requests build it at once
+    """
+    export_df = read_exported_csv(csv_path)
+    partial_path = f"{excel_path}.{os.getpid()}.partial"
+    
+    try:
+        export_to_excel(export_df, partial_path)
+        os.replace(partial_path, excel_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+
+def read_exported_csv(csv_path: str) -> pd.DataFrame:
+    """
+    Read an exported CSV back into the frame prepare_data_for_export produced
+    """
+    # Text columns stay strings ("" rather than NaN); only empty amounts are missing
+    return pd.read_csv(
+        csv_path,
+        encoding='utf-8-sig',
+        dtype={'Date': str, 'Description': str, 'Debit': float, 'Credit': float, 'Balance': float},
+        keep_default_na=False,
+        na_values={'Debit': [''], 'Credit': [''], 'Balance': ['']}
+    )
+
 def prepare_data_for_export(df: pd.DataFrame) -> pd.DataFrame:
     """
     Prepare DataFrame for export with proper formatting
@@ -64,16 +142,15 @@ def prepare_data_for_export(df: pd.DataFrame) -> pd.DataFrame:
     # Reorder columns
     export_df = export_df[required_columns]
     
-    # Format amounts to 2 decimal places
+    # Keep amounts numeric (rounded to pence) - each writer formats them to 2 decimal places
     for col in ['Debit', 'Credit', 'Balance']:
-        export_df[col] = export_df[col].apply(lambda x: f"{x:.2f}" if pd.notnull(x) else "")
+        export_df[col] = pd.to_numeric(export_df[col], errors='coerce').round(2)
     
     # Clean up description
-    export_df['Description'] = export_df['Description'].fillna('').astype(str)
-    export_df['Description'] = export_df['Description'].apply(lambda x: x.strip())
+    export_df['Description'] = export_df['Description'].fillna('').astype(str).str.strip()
     
-    # Replace NaN values with empty strings for better display
-    export_df = export_df.fillna('')
+    # Date is the only column left that can hold missing values
+    export_df['Date'] = export_df['Date'].fillna('')
     
     return export_df
 
@@ -82,20 +159,17 @@ def export_to_excel(df: pd.DataFrame, file_path: str):
     Export DataFrame to Excel with professional formatting
     """
     try:
-        # Create a new workbook and select the active sheet
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Bank Transactions"
-        
-        # Add data to worksheet
-        for r in dataframe_to_rows(df, index=False, header=True):
-            ws.append(r)
-        
-        # Apply formatting
-        format_excel_worksheet(ws, len(df))
-        
-        # Save the workbook
-        wb.save(file_path)
+        # Missing amounts must be written as empty cells, not NaN
+        df = df.astype(object).where(df.notna(), None)
+        
+        if XLSX_ENGINE == 'xlsxwriter':
+            try:
+                write_excel_with_xlsxwriter(df, file_path)
+            except ImportError:
+                logger.warning("xlsxwriter not installed, falling back to openpyxl")
+                write_excel_with_openpyxl(df, file_path)
+        else:
+            write_excel_with_openpyxl(df, file_path)
         
         # Verify the file was created and is valid
         verify_excel_file(file_path)
@@ -106,119 +180,183 @@ def export_to_excel(df: pd.DataFrame, file_path: str):
         logger.error(f"Error exporting to Excel: {str(e)}")
         raise
 
-def format_excel_worksheet(ws, data_rows: int):
+def write_excel_with_openpyxl(df: pd.DataFrame, file_path: str):
+    """
+    Write the formatted workbook with openpyxl in write-only mode
+    """
+    # Write-only mode streams rows to disk instead of holding the whole cell tree in memory
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Bank Transactions")
+    
+    # Register the named styles once, then sheet-level formatting before the first row
+    register_named_styles(wb)
+    format_excel_worksheet(ws)
+    
+    # Column kind is fixed per column, so resolve each column's style name up front
+    column_styles = [CELL_STYLES[col in AMOUNT_COLUMNS] for col in range(len(df.columns))]
+    
+    # Add header and data rows with their styles attached as they are written
+    ws.append([create_styled_cell(ws, column, HEADER_STYLE) for column in df.columns])
+    
+    for row in df.itertuples(index=False, name=None):
+        ws.append([
+            create_styled_cell(ws, value, column_styles[col])
+            for col, value in enumerate(row)
+        ])
+    
+    # Shade every other data row
+    if len(df) > 0:
+        data_range = f"A2:{get_column_letter(len(df.columns))}{len(df) + 1}"
+        ws.conditional_formatting.add(data_range, FormulaRule(formula=[ALT_ROW_FORMULA], fill=ALT_ROW_FILL))
+    
+    # Save the workbook
+    wb.save(file_path)
+
+def write_excel_with_xlsxwriter(df: pd.DataFrame, file_path: str):
     """
-    Apply professional formatting to Excel worksheet
+    Write the formatted workbook with xlsxwriter, flushing each row to disk as it is written
     """
+    import xlsxwriter
+    
+    workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True, 'use_zip64': True})
     try:
-        # Define styles
-        header_font = Font(name='Arial', size=12, bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        
-        data_font = Font(name='Arial', size=11)
-        data_alignment = Alignment(horizontal='left', vertical='center')
-        amount_alignment = Alignment(horizontal='right', vertical='center')
-        
-        # Borders
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Format header row
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
-        
-        # Format data rows
-        for row in range(2, data_rows + 2):
-            for col in range(1, 6):  # 5 columns
-                cell = ws.cell(row=row, column=col)
-                cell.font = data_font
-                cell.border = thin_border
-                
-                # Right-align amount columns
-                if col in [3, 4, 5]:  # Debit, Credit, Balance columns
-                    cell.alignment = amount_alignment
-                    # Format as currency if it contains a number
-                    if cell.value and str(cell.value).replace('.', '').replace('-', '').isdigit():
-                        cell.number_format = '£#,##0.00'
-                else:
-                    cell.alignment = data_alignment
-        
-        # Auto-adjust column widths
-        column_widths = {
-            'A': 12,  # Date
-            'B': 40,  # Description
-            'C': 15,  # Debit
-            'D': 15,  # Credit
-            'E': 15,  # Balance
-        }
-        
-        for col, width in column_widths.items():
+        ws = workbook.add_worksheet("Bank Transactions")
+        
+        # Formats mirror the openpyxl named styles
+        base = {'font_name': 'Arial', 'font_size': 11, 'border': 1, 'valign': 'vcenter'}
+        header_format = workbook.add_format({
+            **base, 'font_size': 12, 'bold': True, 'font_color': '#FFFFFF',
+            'bg_color': '#366092', 'align': 'center'
+        })
+        cell_formats = {}
+        for is_amount in CELL_STYLES:
+            properties = {**base, 'align': 'right' if is_amount else 'left'}
+            if is_amount:
+                properties['num_format'] = AMOUNT_FORMAT
+            cell_formats[is_amount] = workbook.add_format(properties)
+        alt_row_format = workbook.add_format({'bg_color': '#F8F9FA'})
+        
+        for col, width in COLUMN_WIDTHS.items():
+            ws.set_column(f'{col}:{col}', width)
+        ws.freeze_panes(1, 0)
+        
+        column_formats = [cell_formats[col in AMOUNT_COLUMNS] for col in range(len(df.columns))]
+        
+        ws.write_row(0, 0, list(df.columns), header_format)
+        
+        for row_num, row in enumerate(df.itertuples(index=False, name=None), start=1):
+            for col, value in enumerate(row):
+                ws.write(row_num, col, value, column_formats[col])
+        
+        # Shade every other data row
+        if len(df) > 0:
+            ws.conditional_format(1, 0, len(df), len(df.columns) - 1, {
+                'type': 'formula', 'criteria': f'={ALT_ROW_FORMULA}', 'format': alt_row_format
+            })
+    finally:
+        workbook.close()
+
+def format_excel_worksheet(ws):
+    """
+    Apply sheet-level formatting (column widths, frozen header) to a write-only worksheet
+    """
+    try:
+        for col, width in COLUMN_WIDTHS.items():
             ws.column_dimensions[col].width = width
         
         # Freeze the header row
         ws.freeze_panes = 'A2'
         
-        # Add alternating row colors for better readability
-        light_fill = PatternFill(start_color='F8F9FA', end_color='F8F9FA', fill_type='solid')
-        for row in range(3, data_rows + 2, 2):  # Every other row starting from row 3
-            for col in range(1, 6):
-                ws.cell(row=row, column=col).fill = light_fill
-        
     except Exception as e:
         logger.warning(f"Error formatting Excel worksheet: {str(e)}")
 
+def register_named_styles(wb):
+    """
+    Register the header and data cell named styles on a workbook
+    """
+    wb.add_named_style(NamedStyle(
+        name=HEADER_STYLE, font=HEADER_FONT, fill=HEADER_FILL,
+        alignment=HEADER_ALIGNMENT, border=THIN_BORDER
+    ))
+    
+    for is_amount, name in CELL_STYLES.items():
+        style = NamedStyle(
+            name=name,
+            font=DATA_FONT,
+            border=THIN_BORDER,
+            alignment=AMOUNT_ALIGNMENT if is_amount else DATA_ALIGNMENT
+        )
+        if is_amount:
+            style.number_format = AMOUNT_FORMAT
+        wb.add_named_style(style)
+
+def create_styled_cell(ws, value, style_name: str) -> WriteOnlyCell:
+    """
+    Create a write-only cell with a registered named style
+    """
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style_name
+    return cell
+
 def verify_excel_file(file_path: str):
     """
-    Verify that the Excel file was created correctly and can be opened
+    Verify that the Excel file was created correctly (cheap ZIP signature check)
     """
     try:
-        # Try to open and read the file
-        test_wb = openpyxl.load_workbook(file_path)
-        test_ws = test_wb.active
+        # XLSX files are ZIP archives - an empty or truncated write fails this check
+        with open(file_path, 'rb') as f:
+            if f.read(len(XLSX_SIGNATURE)) != XLSX_SIGNATURE:
+                raise Exception("Excel file is not a valid XLSX archive")
         
-        # Check that it has data
-        if test_ws.max_row < 1:
-            raise Exception("Excel file appears to be empty")
+        # Full workbook re-parse is a development aid only
+        if logger.isEnabledFor(logging.DEBUG):
+            verify_excel_contents(file_path)
         
-        # Check that headers exist
-        headers = [cell.value for cell in test_ws[1]]
-        required_headers = ['Date', 'Description', 'Debit', 'Credit', 'Balance']
-        
-        for header in required_headers:
-            if header not in headers:
-                raise Exception(f"Missing required header: {header}")
-        
-        test_wb.close()
         logger.info("Excel file verification successful")
         
     except Exception as e:
         logger.error(f"Excel file verification failed: {str(e)}")
         raise Exception(f"Created Excel file is invalid: {str(e)}")
 
+def verify_excel_contents(file_path: str):
+    """
+    Re-open the Excel file and check its headers (development tool - parses the whole workbook)
+    """
+    # Try to open and read the file
+    test_wb = openpyxl.load_workbook(file_path)
+    test_ws = test_wb.active
+    
+    # Check that it has data
+    if test_ws.max_row < 1:
+        raise Exception("Excel file appears to be empty")
+    
+    # Check that headers exist
+    headers = [cell.value for cell in test_ws[1]]
+    required_headers = ['Date', 'Description', 'Debit', 'Credit', 'Balance']
+    
+    for header in required_headers:
+        if header not in headers:
+            raise Exception(f"Missing required header: {header}")
+    
+    test_wb.close()
+
 def export_to_csv(df: pd.DataFrame, file_path: str):
     """
     Export DataFrame to CSV format
     """
     try:
-        # Export with proper encoding and formatting
-        df.to_csv(
-            file_path,
-            index=False,
-            encoding='utf-8-sig',  # BOM for Excel compatibility
-            float_format='%.2f',
-            date_format='%Y-%m-%d'
-        )
+        # Stream rows through a large write buffer in chunks rather than one big string
+        with open(file_path, 'w', encoding='utf-8-sig', newline='', buffering=CSV_BUFFER_SIZE) as f:  # BOM for Excel compatibility
+            df.to_csv(
+                f,
+                index=False,
+                float_format='%.2f',
+                date_format='%Y-%m-%d',
+                chunksize=CSV_CHUNK_ROWS
+            )
         
         # Verify the file was created
-        verify_csv_file(file_path, len(df))
+        verify_csv_file(file_path)
         
         logger.info(f"CSV file exported successfully: {file_path}")
         
@@ -226,21 +364,22 @@ def export_to_csv(df: pd.DataFrame, file_path: str):
         logger.error(f"Error exporting to CSV: {str(e)}")
         raise
 
-def verify_csv_file(file_path: str, expected_rows: int):
+def verify_csv_file(file_path: str):
     """
-    Verify that the CSV file was created correctly
+    Verify that the CSV file was created correctly by checking its header line
     """
     try:
-        # Read the file back to verify
-        test_df = pd.read_csv(file_path, encoding='utf-8-sig')
-        
-        # Check row count (excluding header)
-        if len(test_df) != expected_rows:
-            logger.warning(f"CSV row count mismatch: expected {expected_rows}, got {len(test_df)}")
+        # Only the header is read back - the rows were just written from the DataFrame.
+        # An empty file reads as an empty line, so no separate size check is needed
+        with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+            header_line = f.readline()
+        if not header_line:
+            raise Exception("CSV file is empty")
+        headers = next(csv.reader([header_line]), [])
         
         # Check required columns
         required_columns = ['Date', 'Description', 'Debit', 'Credit', 'Balance']
-        missing_columns = [col for col in required_columns if col not in test_df.columns]
+        missing_columns = [col for col in required_columns if col not in headers]
         
         if missing_columns:
             raise Exception(f"Missing columns in CSV: {missing_columns}")
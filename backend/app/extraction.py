@@ -1,30 +1,108 @@
 # backend/app/extraction.py - OPTIMIZED FOR PRODUCTION
 import pdfplumber
-from pdf2image import convert_from_path
+from pdfplumber.utils import cluster_objects
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageEnhance
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from operator import itemgetter
+import atexit
 import logging
+import os
+import queue
 import re
 import io
+from typing import List, Optional, Tuple
+
+# Optional: tesserocr keeps Tesseract loaded in-process instead of starting a process per page
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Optional: PyMuPDF reads a page's text layer far faster than pdfminer, so it is used to
+# spot scanned PDFs before pdfplumber parses any page layout
+try:
+    import fitz
+except ImportError:
+    fitz = None
 
 logger = logging.getLogger(__name__)
 
-def extract_pdf_content(pdf_path: str) -> str:
+# Word clustering tolerances (in PDF points) for rebuilding text lines
+WORD_X_TOLERANCE = 1.5
+WORD_Y_TOLERANCE = 3
+
+# Text extraction stops if none of the first pages has a text layer (scanned PDF)
+SCANNED_PDF_PAGE_LIMIT = 3
+
+# Pages with less embedded text than this (in characters) are OCR'd when falling back to OCR
+OCR_PAGE_TEXT_THRESHOLD = 50
+
+# Pages are rendered and OCR'd in parallel - each pytesseract call runs its own tesseract
+# process, so threads are enough to keep every core busy
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", os.cpu_count() or 1))
+
+OCR_DPI = 300
+
+# Parallel tesseract processes should not each spawn a full set of OpenMP threads
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# Page preprocessing enhancement factors (1.0 leaves the image unchanged)
+OCR_CONTRAST_FACTOR = 1.5
+OCR_SHARPNESS_FACTOR = 1.2
+
+OCR_CHAR_WHITELIST = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/-:£$€ \n'
+OCR_CONFIG = f'--oem 3 --psm 6 -c tessedit_char_whitelist={OCR_CHAR_WHITELIST}'
+
+# Idle tesserocr API instances - the model is loaded once per instance and reused across
+# pages and documents (an instance is not thread-safe, so each OCR thread checks one out)
+tesseract_apis = queue.SimpleQueue()
+
+# Common bank statement indicators used to judge extracted text
+MEANINGFUL_TEXT_INDICATORS = [re.compile(pattern) for pattern in (
+    r'\d{2}[/-]\d{2}[/-]\d{2,4}',  # Date patterns
+    r'£\s*\d+\.\d{2}',              # Currency amounts
+    r'\$\s*\d+\.\d{2}',             # Dollar amounts
+    r'€\s*\d+\.\d{2}',              # Euro amounts
+    r'\d+\.\d{2}',                  # Decimal numbers (amounts)
+    r'balance',                      # Balance keyword
+    r'debit|credit',                # Transaction types
+    r'description',                 # Column headers
+)]
+
+# Common OCR mistakes, compiled once - applied in this order, since later fixes see earlier ones' output
+OCR_FIXES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r'£(\s+)', '£'),                # Fix currency spacing
+    (r'\$(\s+)', '$'),               # Fix dollar spacing
+    (r'€(\s+)', '€'),                # Fix euro spacing
+    (r'(\d)\s+\.(\d)', r'\1.\2'),     # Fix decimal point spacing
+    (r'(\d)\s+,(\d)', r'\1,\2'),      # Fix thousand separator spacing
+    (r'[Il|]\s*(\d)', r'1\1'),        # Fix 1 recognition
+    (r'(\d)\s*[Il|]', r'\g<1>0'),     # Use \g<1> instead of \10
+    (r'[Oo](\d)', r'0\1'),            # Fix O->0 at start
+    (r'(\d)[Oo]', r'\g<1>0'),         # Use \g<1> instead of \10
+)]
+
+def extract_pdf_content(pdf_path: str, session_id: Optional[str] = None) -> str:
     """
     Extract content from PDF using text extraction first, OCR as fallback
     """
     try:
         # First, try text extraction
-        text_content = extract_text_from_pdf(pdf_path)
+        page_texts = extract_page_texts(pdf_path, session_id)
+        text_content = join_page_texts(page_texts)
         
         # Check if we got meaningful content
         if is_meaningful_text(text_content):
             logger.info("Successfully extracted text from PDF")
             return normalize_text(text_content)
         
-        # Fallback to OCR if text extraction failed
+        # Fallback to OCR if text extraction failed - only pages without usable text are OCR'd
         logger.info("Text extraction insufficient, falling back to OCR")
-        ocr_content = extract_text_with_ocr(pdf_path)
+        ocr_content, _ = extract_text_with_page_ocr(pdf_path, page_texts)
         
         if is_meaningful_text(ocr_content):
             logger.info("Successfully extracted text using OCR")
@@ -40,75 +118,238 @@ def extract_text_from_pdf(pdf_path: str) -> str:
     """
     Extract text from PDF using pdfplumber
     """
-    text_content = []
+    return join_page_texts(extract_page_texts(pdf_path))
+
+def extract_page_texts(pdf_path: str, session_id: Optional[str] = None) -> List[str]:
+    """
+    Extract the embedded text of every page ("" for pages without any)
+    
+    Gives up early (returning []) when the first pages have no text layer,
+    so scanned PDFs go straight to OCR without walking every page
+    """
+    page_texts = []
+    pages_with_text = 0
+    total_pages = 0
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
-            logger.info(f"Processing PDF with {total_pages} pages")
-            
-            for page_num, page in enumerate(pdf.pages):
-                try:
-                    text = page.extract_text()
-                    if text:
-                        text_content.append(text)
-                        # Only log progress at intervals
-                        if page_num % 10 == 0 or page_num == total_pages - 1:
-                            logger.debug(f"Processed {page_num + 1}/{total_pages} pages")
-                except Exception as e:
-                    if page_num == 0:  # Only log first failure
-                        logger.warning(f"Could not extract text from some pages: {str(e)}")
-                    continue
-        
-        logger.info(f"Text extraction complete: extracted from {len(text_content)}/{total_pages} pages")
-        return '\n'.join(text_content)
+        if has_text_layer(pdf_path, session_id) is False:
+            logger.info(f"No text layer in first {SCANNED_PDF_PAGE_LIMIT} pages, treating PDF as scanned")
+            return []
+        
+        for page_num, total_pages, text in iter_pdf_page_texts(pdf_path):
+            page_texts.append(text)
+            if text:
+                pages_with_text += 1
+                # Only log progress at intervals
+                if page_num % 10 == 0 or page_num == total_pages - 1:
+                    logger.debug("Processed %d/%d pages", page_num + 1, total_pages)
+            elif not pages_with_text and page_num + 1 >= SCANNED_PDF_PAGE_LIMIT:
+                logger.info(f"No text layer in first {page_num + 1} pages, treating PDF as scanned")
+                return []
+        
+        logger.info(f"Text extraction complete: extracted from {pages_with_text}/{total_pages} pages")
+        return page_texts
         
     except Exception as e:
         logger.error(f"Error in text extraction: {str(e)}")
-        return ""
+        return []
 
-def extract_text_with_ocr(pdf_path: str) -> str:
+def has_text_layer(pdf_path: str, session_id: Optional[str] = None) -> Optional[bool]:
     """
-    Extract text from PDF using OCR (for scanned documents)
+    Whether any of the first pages has embedded text, checked with PyMuPDF
+    
+    Returns None when PyMuPDF is not installed or cannot read the file (damaged,
+    encrypted, ...), leaving the check to the pdfplumber pass
     """
-    ocr_content = []
+    if fitz is None:
+        return None
     
     try:
-        # Convert PDF to images
-        logger.info("Converting PDF to images for OCR...")
-        images = convert_from_path(pdf_path, dpi=300)
-        total_pages = len(images)
-        logger.info(f"Starting OCR on {total_pages} pages")
+        with fitz.open(pdf_path) as doc:
+            first_pages = doc.pages(0, min(SCANNED_PDF_PAGE_LIMIT, doc.page_count))
+            return any(page.get_text("text").strip() for page in first_pages)
+    except Exception as e:
+        logger.warning(f"Session {session_id}: PyMuPDF text-layer check failed, falling back to pdfplumber: {str(e)}")
+        return None
+
+def join_page_texts(page_texts: List[str]) -> str:
+    """
+    Join page texts in page order, skipping empty pages
+    """
+    return '\n'.join(text for text in page_texts if text)
+
+def iter_pdf_page_texts(pdf_path: str):
+    """
+    Yield (page_num, total_pages, text) for each page, extracting one page at a time
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        total_pages = len(pdf.pages)
+        logger.info(f"Processing PDF with {total_pages} pages")
         
-        for page_num, image in enumerate(images):
+        for page_num, page in enumerate(pdf.pages):
             try:
-                # Preprocess image for better OCR
-                processed_image = preprocess_image_for_ocr(image)
-                
-                # Extract text using OCR
-                text = pytesseract.image_to_string(
-                    processed_image, 
-                    config='--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,/-:£$€ \n'
-                )
-                
-                if text.strip():
-                    ocr_content.append(text)
-                    # Only log progress at intervals
-                    if page_num % 5 == 0 or page_num == total_pages - 1:
-                        logger.debug(f"OCR processed {page_num + 1}/{total_pages} pages")
-                    
+                text = extract_page_lines(page)
             except Exception as e:
                 if page_num == 0:  # Only log first failure
-                    logger.warning(f"OCR failed on some pages: {str(e)}")
-                continue
+                    logger.warning(f"Could not extract text from some pages: {str(e)}")
+                text = ""
+            finally:
+                # Release the page's parsed layout objects before moving on
+                page.flush_cache()
+            
+            yield page_num, total_pages, text
+
+def extract_page_lines(page) -> str:
+    """
+    Extract a page's text as lines rebuilt from pdfplumber's word tokens
+    
+    Words are grouped into lines by their top coordinate and ordered left to right,
+    which suits the fixed-column layout of bank statements
+    """
+    words = page.extract_words(
+        x_tolerance=WORD_X_TOLERANCE,
+        y_tolerance=WORD_Y_TOLERANCE,
+        keep_blank_chars=False,
+        use_text_flow=True
+    )
+    
+    lines = cluster_objects(words, 'top', WORD_Y_TOLERANCE)
+    return '\n'.join(
+        ' '.join(word['text'] for word in sorted(line, key=itemgetter('x0')))
+        for line in lines
+    )
+
+def extract_text_with_ocr(pdf_path: str) -> str:
+    """
+    Extract text from PDF using OCR (for scanned documents)
+    """
+    try:
+        page_texts = ocr_pdf_pages(pdf_path)
+        ocr_content = [text for text in page_texts if text.strip()]
         
-        logger.info(f"OCR complete: extracted from {len(ocr_content)}/{total_pages} pages")
+        logger.info(f"OCR complete: extracted from {len(ocr_content)}/{len(page_texts)} pages")
         return '\n'.join(ocr_content)
         
     except Exception as e:
         logger.error(f"Error in OCR extraction: {str(e)}")
         return ""
 
+def extract_text_with_page_ocr(pdf_path: str, page_texts: List[str]) -> Tuple[str, List[int]]:
+    """
+    OCR only the pages whose embedded text is too short to be useful, keeping the rest
+    
+    Returns the merged text in page order and the (0-based) numbers of the OCR'd pages.
+    Without any page texts (scanned PDF) every page is OCR'd
+    """
+    try:
+        if not page_texts:
+            page_texts = ocr_pdf_pages(pdf_path)
+            ocr_pages = list(range(len(page_texts)))
+        else:
+            ocr_pages = [
+                page_num for page_num, text in enumerate(page_texts)
+                if len(text.strip()) < OCR_PAGE_TEXT_THRESHOLD
+            ]
+            page_texts = list(page_texts)
+            # The text pass already counted the pages, so OCR doesn't re-parse the PDF for it
+            ocr_texts = ocr_pdf_pages(pdf_path, ocr_pages, total_pages=len(page_texts))
+            for page_num, text in zip(ocr_pages, ocr_texts):
+                if text.strip():  # Keep the short embedded text if OCR found nothing
+                    page_texts[page_num] = text
+        
+        logger.info(f"OCR complete: OCR'd {len(ocr_pages)}/{len(page_texts)} pages, kept embedded text on the rest")
+        return join_page_texts(page_texts), ocr_pages
+        
+    except Exception as e:
+        logger.error(f"Error in OCR extraction: {str(e)}")
+        return "", []
+
+def ocr_pdf_pages(
+    pdf_path: str, page_numbers: Optional[List[int]] = None, total_pages: Optional[int] = None
+) -> List[str]:
+    """
+    OCR the given pages (every page by default), returning their text in the same order
+    
+    Pass total_pages when it is already known to skip reading it with pdfinfo
+    """
+    if total_pages is None:
+        total_pages = pdfinfo_from_path(pdf_path)["Pages"]
+    if page_numbers is None:
+        page_numbers = range(total_pages)
+    if not page_numbers:
+        return []
+    
+    # No more threads than pages, so OCR'ing one or two pages doesn't start a full pool
+    workers = min(OCR_WORKERS, len(page_numbers))
+    logger.info(f"Starting OCR on {len(page_numbers)} pages with {workers} workers")
+    
+    # Each worker renders its own page, so only about OCR_WORKERS page images are in
+    # memory at once; map() keeps results in page order
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(partial(ocr_page, pdf_path, total_pages=total_pages), page_numbers))
+
+def ocr_page(pdf_path: str, page_num: int, total_pages: int) -> str:
+    """
+    Render and OCR a single page, returning an empty string if it fails
+    """
+    try:
+        # Poppler renders straight to grayscale, so pages never go through an RGB copy
+        image = convert_from_path(
+            pdf_path, dpi=OCR_DPI, grayscale=True, first_page=page_num + 1, last_page=page_num + 1
+        )[0]
+        
+        # Preprocess image for better OCR
+        processed_image = preprocess_image_for_ocr(image)
+        
+        # Extract text using OCR
+        text = ocr_image(processed_image)
+        
+        # Only log progress at intervals
+        if text.strip() and (page_num % 5 == 0 or page_num == total_pages - 1):
+            logger.debug("OCR processed %d/%d pages", page_num + 1, total_pages)
+        
+        return text
+        
+    except Exception as e:
+        if page_num == 0:  # Only log first failure
+            logger.warning(f"OCR failed on some pages: {str(e)}")
+        return ""
+
+def ocr_image(image: Image.Image) -> str:
+    """
+    Run Tesseract on a preprocessed page image
+    """
+    if tesserocr is None:
+        return pytesseract.image_to_string(image, config=OCR_CONFIG)
+    
+    with tesseract_api() as api:
+        api.SetImage(image)
+        return api.GetUTF8Text()
+
+@contextmanager
+def tesseract_api():
+    """
+    Check out an idle tesserocr API, creating one if every instance is in use
+    """
+    try:
+        api = tesseract_apis.get_nowait()
+    except queue.Empty:
+        api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.DEFAULT)
+        api.SetVariable("tessedit_char_whitelist", OCR_CHAR_WHITELIST)
+    
+    try:
+        yield api
+    finally:
+        tesseract_apis.put(api)
+
+@atexit.register
+def release_tesseract_apis():
+    """
+    Free the cached tesserocr instances on interpreter exit
+    """
+    while not tesseract_apis.empty():
+        tesseract_apis.get_nowait().End()
+
 def preprocess_image_for_ocr(image: Image.Image) -> Image.Image:
     """
     Preprocess image to improve OCR accuracy
@@ -118,16 +359,11 @@ def preprocess_image_for_ocr(image: Image.Image) -> Image.Image:
         if image.mode != 'L':
             image = image.convert('L')
         
-        # Enhance contrast and sharpness
-        from PIL import ImageEnhance
-        
         # Increase contrast
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.5)
+        image = image.point(contrast_lookup_table(image, OCR_CONTRAST_FACTOR))
         
         # Increase sharpness
-        enhancer = ImageEnhance.Sharpness(image)
-        image = enhancer.enhance(1.2)
+        image = ImageEnhance.Sharpness(image).enhance(OCR_SHARPNESS_FACTOR)
         
         return image
         
@@ -135,6 +371,17 @@ def preprocess_image_for_ocr(image: Image.Image) -> Image.Image:
         logger.warning(f"Image preprocessing failed: {str(e)}")
         return image
 
+def contrast_lookup_table(image: Image.Image, factor: float) -> list:
+    """
+    Build a grayscale lookup table equivalent to ImageEnhance.Contrast(image).enhance(factor)
+    
+    Stretches each pixel away from the mean grey level in a single image.point() pass,
+    instead of allocating a flat mean-grey image and blending it with the page
+    """
+    histogram = image.histogram()
+    mean = int(sum(level * count for level, count in enumerate(histogram)) / max(sum(histogram), 1) + 0.5)
+    return [min(255, max(0, int(mean + factor * (level - mean)))) for level in range(256)]
+
 def is_meaningful_text(text: str) -> bool:
     """
     Check if extracted text contains meaningful bank statement content
@@ -142,20 +389,8 @@ def is_meaningful_text(text: str) -> bool:
     if not text or len(text.strip()) < 50:
         return False
     
-    # Look for common bank statement indicators
-    indicators = [
-        r'\d{2}[/-]\d{2}[/-]\d{2,4}',  # Date patterns
-        r'£\s*\d+\.\d{2}',              # Currency amounts
-        r'\$\s*\d+\.\d{2}',             # Dollar amounts
-        r'€\s*\d+\.\d{2}',              # Euro amounts
-        r'\d+\.\d{2}',                  # Decimal numbers (amounts)
-        r'balance',                      # Balance keyword
-        r'debit|credit',                # Transaction types
-        r'description',                 # Column headers
-    ]
-    
     text_lower = text.lower()
-    matches = sum(1 for pattern in indicators if re.search(pattern, text_lower))
+    matches = sum(1 for pattern in MEANINGFUL_TEXT_INDICATORS if pattern.search(text_lower))
     
     # If we find at least 3 different indicators, consider it meaningful
     return matches >= 3
@@ -168,19 +403,9 @@ def normalize_text(text: str) -> str:
         return ""
     
     try:
-        # Fix encoding issues
-        text = text.encode('utf-8', errors='ignore').decode('utf-8')
-        
-        # Remove excessive whitespace but preserve structure
-        lines = []
-        for line in text.split('\n'):
-            # Clean up each line
-            line = re.sub(r'\s+', ' ', line.strip())
-            if line:  # Only keep non-empty lines
-                lines.append(line)
-        
-        # Rejoin lines
-        normalized = '\n'.join(lines)
+        # Collapse whitespace runs within each line and drop empty lines (str.split/join run in C)
+        lines = (' '.join(line.split()) for line in text.splitlines())
+        normalized = '\n'.join(line for line in lines if line)
         
         # Fix common OCR errors
         normalized = fix_common_ocr_errors(normalized)
@@ -195,20 +420,7 @@ def fix_common_ocr_errors(text: str) -> str:
     """
     Fix common OCR recognition errors
     """
-    # Common OCR mistakes - FIXED GROUP REFERENCES
-    replacements = {
-        r'£(\s+)': '£',          # Fix currency spacing
-        r'\$(\s+)': '$',         # Fix dollar spacing
-        r'€(\s+)': '€',          # Fix euro spacing
-        r'(\d)\s+\.(\d)': r'\1.\2',  # Fix decimal point spacing
-        r'(\d)\s+,(\d)': r'\1,\2',   # Fix thousand separator spacing
-        r'[Il|]\s*(\d)': r'1\1',     # Fix 1 recognition
-        r'(\d)\s*[Il|]': r'\g<1>0',  # FIXED: Use \g<1> instead of \10
-        r'[Oo](\d)': r'0\1',         # Fix O->0 at start
-        r'(\d)[Oo]': r'\g<1>0',      # FIXED: Use \g<1> instead of \10
-    }
-    
-    for pattern, replacement in replacements.items():
-        text = re.sub(pattern, replacement, text)
+    for pattern, replacement in OCR_FIXES:
+        text = pattern.sub(replacement, text)
     
     return text
\ No newline at end of file
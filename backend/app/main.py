@@ -1,20 +1,32 @@
 # backend/app/main.py - PRODUCTION OPTIMIZED
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Request, Response
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional, Dict, Any
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import anyio
+import asyncio
+import multiprocessing
 import os
+import re
+import shutil
 import tempfile
-import uuid
+import secrets
 from pathlib import Path
+from urllib.parse import parse_qs
 import logging
 import traceback
 import time
 from datetime import datetime
 import json
 import pandas as pd
-import numpy as np
-from decimal import Decimal
+from dataclasses import dataclass
+from functools import lru_cache
+import orjson
+import psutil
+import pytesseract
 
 # Import logging config BEFORE other modules
 from .logging_config import setup_logging
@@ -26,12 +38,73 @@ setup_logging(log_level)
 logger = logging.getLogger(__name__)
 
 # Import after logging setup to ensure proper log filtering
-from .extraction import extract_pdf_content
-from .parsing import parse_transactions
-from .export import export_to_files
-from .utils import cleanup_temp_files
+import pdfplumber
+from .extraction import (
+    extract_pdf_content, extract_page_texts, join_page_texts, extract_text_with_ocr,
+    extract_text_with_page_ocr, is_meaningful_text, normalize_text
+)
+from .parsing import parse_transactions, extract_all_transaction_lines, preprocess_content
+from .export import export_to_files, export_excel_from_csv
+from .utils import cleanup_temp_files, cleanup_old_temp_files, remove_temp_file
+
+# orjson serializes every endpoint's JSON body instead of the stdlib encoder
+app = FastAPI(title="Bank Statement Converter", version="1.0.0", default_response_class=ORJSONResponse)
+
+# Request bodies (uploads) larger than this are rejected with a 413
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+
+class RequestBodyTooLarge(HTTPException):
+    """Raised while reading a body without a Content-Length once it passes the upload limit"""
+    def __init__(self, max_size: int):
+        super().__init__(status_code=413, detail="Request body too large")
+        self.max_size = max_size
+
+def body_too_large_response(max_size: int) -> ORJSONResponse:
+    """The 413 body for an oversized upload, whether it was caught by Content-Length or while reading"""
+    return ORJSONResponse(status_code=413, content={
+        "error": True,
+        "message": f"File too large (limit {max_size // (1024 * 1024)} MB)"
+    })
+
+@app.exception_handler(RequestBodyTooLarge)
+async def request_body_too_large_handler(request: Request, exc: RequestBodyTooLarge):
+    return body_too_large_response(exc.max_size)
+
+class ContentSizeLimitMiddleware:
+    """
+    Reject request bodies over max_size before the app buffers or spools them
+    
+    A declared Content-Length over the limit is refused up front; bodies without one
+    (chunked uploads) are counted as they arrive and cut off once they pass the limit
+    """
+    def __init__(self, app, max_size: int):
+        self.app = app
+        self.max_size = max_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_size:
+            return await body_too_large_response(self.max_size)(scope, receive, send)
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    # An HTTPException, so FastAPI's body parsing re-raises it rather than answering 400
+                    raise RequestBodyTooLarge(self.max_size)
+            return message
+        
+        await self.app(scope, limited_receive, send)
 
-app = FastAPI(title="Bank Statement Converter", version="1.0.0")
+# Added before CORS so that 413 responses still carry the CORS headers
+app.add_middleware(ContentSizeLimitMiddleware, max_size=MAX_UPLOAD_BYTES)
 
 # CORS configuration - fixed
 ALLOWED_ORIGINS = [
@@ -52,194 +125,373 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Query values FastAPI reads as true for a bool parameter
+TRUE_QUERY_VALUES = {"1", "on", "t", "true", "y", "yes"}
+
+def is_streamed_convert(scope) -> bool:
+    """Whether the request is a /convert?stream=true call, answered with NDJSON"""
+    if scope["path"] != "/convert":
+        return False
+    stream_values = parse_qs(scope["query_string"].decode("latin-1")).get("stream")
+    return bool(stream_values) and stream_values[-1].lower() in TRUE_QUERY_VALUES
+
+class DownloadGZipMiddleware(GZipMiddleware):
+    """
+    GZip that passes Excel downloads and streamed conversions through untouched
+    
+    An XLSX is already a ZIP archive, and the gzip responder buffers a streamed NDJSON
+    body until it ends, so clients could not render rows as they arrive
+    """
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and (scope["path"].endswith("/excel") or is_streamed_convert(scope)):
+            return await self.app(scope, receive, send)
+        await super().__call__(scope, receive, send)
+
+# Compress larger responses (CSV downloads, debug payloads) for clients that accept gzip.
+# Level 6 gets nearly all of level 9's savings on CSV text for much less CPU
+app.add_middleware(DownloadGZipMiddleware, minimum_size=1024, compresslevel=6)
+
 # Create temp directory for processing
 TEMP_DIR = Path("temp_files")
 TEMP_DIR.mkdir(exist_ok=True)
 
-# Store debug logs for sessions
-debug_logs: Dict[str, list] = {}
+# Temp files older than this are swept at startup and then periodically
+TEMP_FILE_MAX_AGE_HOURS = 1
+TEMP_SWEEP_INTERVAL_SECONDS = 600
+temp_sweep_task: Optional[asyncio.Task] = None
+
+# Extraction, parsing and export are CPU-heavy, so they run in worker processes
+# instead of blocking the event loop for every other request. Each worker OCRs with its
+# own threads, so the default stops at 4 rather than claiming every core
+CONVERT_WORKERS = int(os.environ.get("CONVERT_WORKERS", min(os.cpu_count() or 1, 4)))
+process_pool: Optional[ProcessPoolExecutor] = None
+
+# Each in-flight conversion holds its upload, extracted text and DataFrame, so only this many
+# run at once - further requests wait their turn instead of exhausting memory
+MAX_CONCURRENT_CONVERT = int(os.environ.get("MAX_CONCURRENT_CONVERT", "4"))
+convert_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CONVERT)
+
+# The /test-* diagnostics run extraction in threads; this bounds how many run at once
+MAX_CONCURRENT_DIAGNOSTICS = int(os.environ.get("MAX_CONCURRENT_DIAGNOSTICS", "2"))
+diagnostic_limiter: Optional[anyio.CapacityLimiter] = None
+
+# Pages a /test-extraction run may have in the shared worker pool at once - half the
+# workers, so diagnostics can't crowd out /convert
+DIAGNOSTIC_PAGE_JOBS = max(1, CONVERT_WORKERS // 2)
+
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PDF_HEADER = b'%PDF-'
+
+# Line classifiers used by the /test-* diagnostics
+DIAGNOSTIC_DATE_RE = re.compile(r'\d{2}/\d{2}/\d{4}')
+DIAGNOSTIC_AMOUNT_RE = re.compile(r'£?\d+\.\d{2}')
+
+def new_session_id() -> str:
+    """
+    Random session id - it is the only thing guarding a session's download URLs,
+    so it keeps 128 random bits, without building a UUID object
+    """
+    return secrets.token_hex(16)
+
+# Longest data payload copied into the application log (the session's debug log keeps it all)
+DEBUG_LOG_DATA_MAX_CHARS = 2048
+
+# Debug logs are appended to a per-session NDJSON file in TEMP_DIR rather than kept in memory;
+# worker processes append to the same file, and it is only read back for debug responses.
+# The files are removed with the session's other temp files.
+def debug_log_path(session_id: str) -> Path:
+    """Path of a session's debug log file"""
+    return TEMP_DIR / f"{session_id}_debug.jsonl"
+
+@dataclass(slots=True)
+class LogEntry:
+    """One debug log entry (orjson serializes dataclasses natively)"""
+    timestamp: str
+    level: str
+    message: str
+    data: Any = None
 
 def add_debug_log(session_id: str, level: str, message: str, data: Any = None):
     """Add a debug log entry for a session"""
-    if session_id not in debug_logs:
-        debug_logs[session_id] = []
-    
-    log_entry = {
-        'timestamp': datetime.now().isoformat(),
-        'level': level,
-        'message': message,
-        'data': data
-    }
+    log_entry = LogEntry(datetime.now().isoformat(), level, message, data)
     
-    debug_logs[session_id].append(log_entry)
+    # One append-mode write per entry, so lines from concurrent writers never interleave
+    with open(debug_log_path(session_id), 'ab') as log_file:
+        log_file.write(orjson.dumps(log_entry, default=str) + b'\n')
     
-    # Also log to file
-    logger.log(
-        getattr(logging, level.upper(), logging.INFO),
-        f"[{session_id}] {message}" + (f" - Data: {data}" if data else "")
-    )
+    # Also log to file - only formatted when the level is enabled, with the data capped
+    log_level = getattr(logging, level.upper(), logging.INFO)
+    if logger.isEnabledFor(log_level):
+        data_suffix = f" - Data: {str(data)[:DEBUG_LOG_DATA_MAX_CHARS]}" if data else ""
+        logger.log(log_level, "[%s] %s%s", session_id, message, data_suffix)
+
+def session_debug_logs(session_id: str) -> list:
+    """Read back a session's debug log entries"""
+    try:
+        with open(debug_log_path(session_id), 'rb') as log_file:
+            return [orjson.loads(line) for line in log_file]
+    except FileNotFoundError:
+        return []
+
+def stream_debug_response(summary: dict, session_id: str):
+    """Yield the response summary, then the session's debug log entries, as NDJSON lines"""
+    yield orjson.dumps(summary) + b'\n'
+    try:
+        # Log lines are already orjson-encoded, so they're passed through as-is
+        with open(debug_log_path(session_id), 'rb') as log_file:
+            yield from log_file
+    except FileNotFoundError:
+        return
+
+class SessionDebugLog:
+    """Writes debug log entries for one session"""
+    __slots__ = ('session_id',)
+    
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+    
+    def info(self, message: str, data: Any = None):
+        add_debug_log(self.session_id, "INFO", message, data)
+    
+    def warning(self, message: str, data: Any = None):
+        add_debug_log(self.session_id, "WARNING", message, data)
+    
+    def error(self, message: str, data: Any = None):
+        add_debug_log(self.session_id, "ERROR", message, data)
+    
+    def entries(self) -> Optional[list]:
+        return session_debug_logs(self.session_id)
+
+class NullDebugLog:
+    """Stands in for SessionDebugLog outside debug mode - every call is a no-op"""
+    __slots__ = ()
+    
+    def info(self, message: str, data: Any = None):
+        pass
+    
+    def warning(self, message: str, data: Any = None):
+        pass
+    
+    def error(self, message: str, data: Any = None):
+        pass
+    
+    def entries(self) -> Optional[list]:
+        return None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Create the conversion worker pool on first use"""
+    global process_pool
+    if process_pool is None:
+        process_pool = ProcessPoolExecutor(
+            max_workers=CONVERT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),  # Safe alongside the server's threads
+            initializer=setup_logging,
+            initargs=(log_level,)
+        )
+    return process_pool
+
+def warm_up_worker() -> int:
+    """No-op task - loading it imports this module, and with it the conversion libraries, in the worker"""
+    return os.getpid()
+
+def get_diagnostic_limiter() -> anyio.CapacityLimiter:
+    """Create the diagnostics thread limiter on first use (it needs a running event loop)"""
+    global diagnostic_limiter
+    if diagnostic_limiter is None:
+        diagnostic_limiter = anyio.CapacityLimiter(MAX_CONCURRENT_DIAGNOSTICS)
+    return diagnostic_limiter
+
+async def run_diagnostic(func, *args):
+    """Run a blocking diagnostic step in a worker thread, within the diagnostics limit"""
+    return await anyio.to_thread.run_sync(func, *args, limiter=get_diagnostic_limiter())
+
+async def run_in_process_pool(func, *args):
+    """Run a blocking conversion step in the worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+async def save_upload_file(file: UploadFile, destination: Path, check_pdf_header: bool = False) -> int:
+    """Stream an uploaded file to disk chunk by chunk, returning its size in bytes"""
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    
+    # Validate the header from the first chunk, before anything is written
+    if check_pdf_header and not chunk.startswith(PDF_HEADER):
+        raise HTTPException(status_code=400, detail="Invalid PDF header")
+    
+    # The rest is copied in a single worker thread hop rather than one read and one write hop per chunk
+    return await run_in_threadpool(write_upload, file.file, destination, chunk)
+
+def write_upload(source, destination: Path, first_chunk: bytes) -> int:
+    """Write the already-read first chunk, then copy the rest of the spooled upload"""
+    with open(destination, "wb") as buffer:
+        buffer.write(first_chunk)
+        shutil.copyfileobj(source, buffer, UPLOAD_CHUNK_SIZE)
+        return buffer.tell()
 
 @app.get("/")
 async def root():
     return {"message": "Bank Statement Converter API", "version": "1.0.0"}
 
+# Health payloads are reused for this long, so frequent probes don't re-collect metrics
+HEALTH_CACHE_SECONDS = 1.0
+health_cache: Tuple[float, dict] = (0.0, {})
+
+@lru_cache(maxsize=1)
+def tesseract_status() -> str:
+    """Tesseract availability - checked once, since get_tesseract_version runs a subprocess"""
+    try:
+        return f"Available (v{pytesseract.get_tesseract_version()})"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+def count_temp_files() -> int:
+    """Count entries in the temp directory without building a list of paths"""
+    with os.scandir(TEMP_DIR) as entries:
+        return sum(1 for _ in entries)
+
+def collect_system_metrics() -> dict:
+    """Memory, disk and temp-file readings for /health (blocking syscalls)"""
+    return {
+        "memory_percent": psutil.virtual_memory().percent,
+        "disk_free_gb": round(psutil.disk_usage('/').free / (1024**3), 2),
+        "tesseract": tesseract_status(),
+        "temp_files": count_temp_files()
+    }
+
 @app.get("/health")
 async def health_check():
     """Enhanced health check with system info"""
+    global health_cache
+    cached_at, payload = health_cache
+    if payload and time.monotonic() - cached_at < HEALTH_CACHE_SECONDS:
+        return payload
+    
     try:
-        import psutil
-        import pytesseract
-        
-        # Check Tesseract
-        try:
-            tesseract_version = pytesseract.get_tesseract_version()
-            tesseract_status = f"Available (v{tesseract_version})"
-        except Exception as e:
-            tesseract_status = f"Error: {str(e)}"
-        
-        return {
+        # Collected off the event loop so a probe never stalls in-flight requests
+        system = await asyncio.to_thread(collect_system_metrics)
+        payload = {
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
-            "system": {
-                "memory_percent": psutil.virtual_memory().percent,
-                "disk_free_gb": round(psutil.disk_usage('/').free / (1024**3), 2),
-                "tesseract": tesseract_status,
-                "temp_files": len(list(TEMP_DIR.glob("*")))
-            }
+            "system": system
         }
+        health_cache = (time.monotonic(), payload)
+        return payload
     except Exception as e:
         logger.error(f"Health check error: {str(e)}")
         return {"status": "healthy", "error": str(e)}
 
 
 
-def safe_json_convert(obj):
-    """Convert numpy/pandas types to JSON-serializable types"""
-    if isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, (np.bool_, bool)):
-        return bool(obj)
-    elif obj is None or pd.isna(obj):
-        return None
-    else:
-        return str(obj)
-
 @app.post("/convert")
 async def convert_bank_statement(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    debug: bool = False
+    debug: bool = False,
+    stream: bool = False
 ):
     """
     Convert uploaded PDF bank statement to Excel and CSV format
+    
+    With debug and stream both set, a successful result is sent as NDJSON:
+    the summary line first, then one line per debug log entry.
+    """
+    async with convert_semaphore:
+        return await run_conversion(file, debug, stream, background_tasks)
+
+async def run_conversion(file: UploadFile, debug: bool, stream: bool, background_tasks: BackgroundTasks):
+    """
+    Run one conversion: save the upload, extract, parse and export
+    
+    Temp file cleanup is queued on background_tasks so it runs after the response is sent
     """
-    session_id = str(uuid.uuid4())
+    session_id = new_session_id()
     start_time = time.time()
     
-    # Initialize debug log only if debug mode is enabled
-    if debug:
-        add_debug_log(session_id, "INFO", "Starting conversion process", {
-            "filename": file.filename,
-            "content_type": file.content_type,
-            "debug_mode": debug
-        })
+    # Debug entries are only recorded in debug mode (NullDebugLog ignores them)
+    debug_log = SessionDebugLog(session_id) if debug else NullDebugLog()
+    debug_log.info("Starting conversion process", {
+        "filename": file.filename,
+        "content_type": file.content_type,
+        "debug_mode": debug
+    })
     
     logger.info(f"Starting conversion for session {session_id}, file: {file.filename}")
     
     if not file.filename.lower().endswith('.pdf'):
         error_msg = f"Invalid file type: {file.filename}"
-        if debug:
-            add_debug_log(session_id, "ERROR", error_msg)
+        debug_log.error(error_msg)
         raise HTTPException(status_code=400, detail=error_msg)
     
     temp_pdf_path = TEMP_DIR / f"{session_id}_input.pdf"
+    # Only the exports are downloaded later, so the upload goes once the response is out
+    background_tasks.add_task(remove_temp_file, temp_pdf_path)
     
     try:
         # Save uploaded file
-        if debug:
-            add_debug_log(session_id, "INFO", "Saving uploaded file")
+        debug_log.info("Saving uploaded file")
         
-        file_content = await file.read()
-        file_size = len(file_content)
+        file_size = await save_upload_file(file, temp_pdf_path, check_pdf_header=True)
         
-        with open(temp_pdf_path, "wb") as buffer:
-            buffer.write(file_content)
-        
-        if debug:
-            add_debug_log(session_id, "INFO", "File saved successfully", {
-                "size_bytes": file_size,
-                "size_mb": round(file_size / (1024*1024), 2),
-                "path": str(temp_pdf_path)
-            })
+        debug_log.info("File saved successfully", {
+            "size_bytes": file_size,
+            "size_mb": round(file_size / (1024*1024), 2),
+            "path": str(temp_pdf_path)
+        })
         
         logger.info(f"File saved: {file_size} bytes")
         
-        # Validate PDF
-        with open(temp_pdf_path, 'rb') as f:
-            header = f.read(5)
-            if not header.startswith(b'%PDF-'):
-                raise ValueError("Invalid PDF header")
-        
-        if debug:
-            add_debug_log(session_id, "INFO", "PDF validation passed")
+        debug_log.info("PDF validation passed")
         
         # Extract content from PDF
+        debug_log.info("Starting PDF content extraction")
         if debug:
-            add_debug_log(session_id, "INFO", "Starting PDF content extraction")
-            raw_content, extraction_details = extract_pdf_content_with_debug(
-                str(temp_pdf_path), session_id
+            raw_content, extraction_details = await run_in_process_pool(
+                extract_pdf_content_with_debug, str(temp_pdf_path), session_id
             )
         else:
-            raw_content = extract_pdf_content(str(temp_pdf_path))
+            raw_content = await run_in_process_pool(extract_pdf_content, str(temp_pdf_path), session_id)
             extraction_details = {}
         
         if not raw_content or not raw_content.strip():
             error_msg = "No content extracted from PDF"
-            if debug:
-                add_debug_log(session_id, "ERROR", error_msg)
+            debug_log.error(error_msg)
             
             # Return simple JSON response
             return {
                 "error": True,
                 "message": error_msg,
                 "session_id": session_id,
-                "debug_logs": debug_logs.get(session_id, []) if debug else None
+                "debug_logs": debug_log.entries()
             }
         
         # Parse transactions
+        debug_log.info("Starting transaction parsing")
         if debug:
-            add_debug_log(session_id, "INFO", "Starting transaction parsing")
-            transactions_df, parsing_details = parse_transactions_with_debug(
-                raw_content, session_id
+            transactions_df, parsing_details = await run_in_process_pool(
+                parse_transactions_with_debug, raw_content, session_id
             )
         else:
-            transactions_df = parse_transactions(raw_content)
+            transactions_df = await run_in_process_pool(parse_transactions, raw_content)
             parsing_details = {}
         
         if transactions_df.empty:
             error_msg = "No transactions found in the PDF"
-            if debug:
-                add_debug_log(session_id, "WARNING", error_msg)
+            debug_log.warning(error_msg)
             
             # Return simple error response
             return {
                 "error": True,
                 "message": error_msg,
                 "session_id": session_id,
-                "debug_logs": debug_logs.get(session_id, []) if debug else None,
+                "debug_logs": debug_log.entries(),
                 "raw_content_preview": raw_content[:2000] if debug and raw_content else None
             }
         
-        # Export to Excel and CSV
-        if debug:
-            add_debug_log(session_id, "INFO", "Starting export to Excel and CSV")
+        # Export to CSV - the Excel workbook follows on first download
+        debug_log.info("Starting export to CSV (Excel is built on first download)")
         
-        excel_path, csv_path = export_to_files(transactions_df, session_id, TEMP_DIR)
+        await run_in_process_pool(export_to_files, transactions_df, session_id, TEMP_DIR)
         
         # Calculate processing time
         processing_time = time.time() - start_time
@@ -259,23 +511,13 @@ async def convert_bank_statement(
         # Add debug information SAFELY
         if debug:
             try:
-                # Convert sample transactions safely
-                sample_transactions = []
-                if not transactions_df.empty:
-                    sample_df = transactions_df.head(5).copy()
-                    
-                    # Convert DataFrame to records
-                    records = sample_df.to_dict('records')
-                    
-                    # Ensure all values are JSON-serializable
-                    for record in records:
-                        safe_record = {}
-                        for key, value in record.items():
-                            safe_record[key] = safe_json_convert(value)
-                        sample_transactions.append(safe_record)
+                # Records hold native Python values and orjson writes NaN as null,
+                # so they are serialized as-is
+                sample_transactions = transactions_df.head(5).to_dict('records')
                 
                 # Add debug info
-                response_data["debug_logs"] = debug_logs.get(session_id, [])
+                if not stream:
+                    response_data["debug_logs"] = debug_log.entries()
                 response_data["raw_content_preview"] = raw_content[:2000] if raw_content else None
                 response_data["sample_transactions"] = sample_transactions
                 
@@ -289,28 +531,47 @@ async def convert_bank_statement(
                 logger.error(f"Error preparing debug data: {str(e)}")
                 # Don't add debug data if it fails
                 response_data["debug_error"] = "Failed to prepare debug data"
+            
+            if stream:
+                return StreamingResponse(
+                    stream_debug_response(response_data, session_id),
+                    media_type="application/x-ndjson"
+                )
         
         # Return the response directly (FastAPI will handle JSON conversion)
         return response_data
         
+    except HTTPException as e:
+        # Rejected upload (nothing was written) - same error body, with the client error status
+        error_msg = f"Error processing file: {e.detail}"
+        logger.warning(f"Rejected upload in session {session_id}: {e.detail}")
+        
+        debug_log.error(error_msg)
+        
+        return ORJSONResponse(status_code=e.status_code, content={
+            "error": True,
+            "message": error_msg,
+            "session_id": session_id,
+            "debug_logs": debug_log.entries()
+        })
+        
     except Exception as e:
         error_msg = f"Error processing file: {str(e)}"
-        logger.error(f"Error in session {session_id}: {error_msg}\n{traceback.format_exc()}")
+        logger.error("Error in session %s: %s", session_id, error_msg, exc_info=True)
         
-        if debug:
-            add_debug_log(session_id, "ERROR", error_msg, {
-                "error_type": type(e).__name__
-            })
+        debug_log.error(error_msg, {
+            "error_type": type(e).__name__
+        })
         
-        # Clean up on error
-        cleanup_temp_files(session_id, TEMP_DIR)
+        # Clean up on error, after the error response is sent
+        background_tasks.add_task(cleanup_temp_files, session_id, TEMP_DIR)
         
         # Return simple error response
         return {
             "error": True,
             "message": error_msg,
             "session_id": session_id,
-            "debug_logs": debug_logs.get(session_id, []) if debug else None
+            "debug_logs": debug_log.entries()
         }
 
 
@@ -318,7 +579,6 @@ async def convert_bank_statement(
 
 def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str, dict]:
     """Enhanced extraction with debugging info and multiple methods"""
-    from .extraction import extract_text_from_pdf, extract_text_with_ocr, is_meaningful_text, normalize_text
     
     extraction_details = {
         "method": None,
@@ -327,14 +587,14 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
         "ocr_result": None,
         "camelot_result": None,
         "tabula_result": None,
-        "raw_text_preview": None,  # Add preview for debug panel
         "all_extracted_text": ""   # Store all text for debugging
     }
     
     try:
         # Method 1: Try standard text extraction with pdfplumber
         add_debug_log(session_id, "DEBUG", "Attempting text extraction with pdfplumber")
-        text_content = extract_text_from_pdf(pdf_path)
+        page_texts = extract_page_texts(pdf_path, session_id)
+        text_content = join_page_texts(page_texts)
         extraction_details["text_extraction_result"] = {
             "content_length": len(text_content),
             "has_content": bool(text_content.strip()),
@@ -345,7 +605,6 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
             add_debug_log(session_id, "DEBUG", "Text extraction successful")
             extraction_details["method"] = "text_extraction"
             extraction_details["all_extracted_text"] = text_content
-            extraction_details["raw_text_preview"] = text_content[:3000]  # For debug panel
             return normalize_text(text_content), extraction_details
         
         # Method 2: Try Camelot for table extraction
@@ -360,7 +619,6 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
                 add_debug_log(session_id, "DEBUG", "Camelot extraction successful")
                 extraction_details["method"] = "camelot"
                 extraction_details["all_extracted_text"] = camelot_content
-                extraction_details["raw_text_preview"] = camelot_content[:3000]
                 return normalize_text(camelot_content), extraction_details
         else:
             extraction_details["camelot_result"] = {
@@ -380,7 +638,6 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
                 add_debug_log(session_id, "DEBUG", "Tabula extraction successful")
                 extraction_details["method"] = "tabula"
                 extraction_details["all_extracted_text"] = tabula_content
-                extraction_details["raw_text_preview"] = tabula_content[:3000]
                 return normalize_text(tabula_content), extraction_details
         else:
             extraction_details["tabula_result"] = {
@@ -390,7 +647,8 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
         
         # Method 4: Fallback to OCR for scanned documents
         add_debug_log(session_id, "DEBUG", "Text extraction insufficient, trying OCR")
-        ocr_content = extract_text_with_ocr(str(pdf_path))
+        ocr_content, ocr_pages = extract_text_with_page_ocr(str(pdf_path), page_texts)
+        extraction_details["pages_ocred"] = [page_num + 1 for page_num in ocr_pages]
         extraction_details["ocr_result"] = {
             "content_length": len(ocr_content),
             "has_content": bool(ocr_content.strip()),
@@ -400,7 +658,6 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
         # FORCE STORE THE OCR TEXT REGARDLESS OF WHETHER IT'S "MEANINGFUL"
         if ocr_content:  # As long as there's ANY text
             extraction_details["all_extracted_text"] = ocr_content
-            extraction_details["raw_text_preview"] = ocr_content[:5000]  # Store more text for debugging
             add_debug_log(session_id, "INFO", f"OCR extracted {len(ocr_content)} characters")
 
 
@@ -408,7 +665,6 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
             add_debug_log(session_id, "DEBUG", "OCR extraction successful")
             extraction_details["method"] = "ocr"
             extraction_details["all_extracted_text"] = ocr_content
-            extraction_details["raw_text_preview"] = ocr_content[:3000]
             return normalize_text(ocr_content), extraction_details
         
         # All methods failed - return best result
@@ -418,7 +674,6 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
         # Return the best content we got
         best_content = text_content or camelot_content or tabula_content or ocr_content
         extraction_details["all_extracted_text"] = best_content
-        extraction_details["raw_text_preview"] = best_content[:3000] if best_content else ""
         
         return best_content, extraction_details
         
@@ -430,29 +685,22 @@ def extract_pdf_content_with_debug(pdf_path: str, session_id: str) -> tuple[str,
 @app.post("/test-ocr")
 async def test_ocr_extraction(file: UploadFile = File(...)):
     """Test what OCR is extracting"""
-    session_id = str(uuid.uuid4())
+    session_id = new_session_id()
     temp_pdf_path = TEMP_DIR / f"{session_id}_input.pdf"
     
     try:
         # Save PDF
-        content = await file.read()
-        with open(temp_pdf_path, "wb") as f:
-            f.write(content)
+        await save_upload_file(file, temp_pdf_path, check_pdf_header=True)
         
         # Extract with OCR
-        from .extraction import extract_text_with_ocr
-        ocr_content = extract_text_with_ocr(str(temp_pdf_path))
+        ocr_content = await run_diagnostic(extract_text_with_ocr, str(temp_pdf_path))
         
         # Save to file for inspection
         output_file = TEMP_DIR / f"{session_id}_ocr.txt"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(ocr_content)
+        await run_diagnostic(output_file.write_text, ocr_content, 'utf-8')
         
         # Look for date patterns
-        date_lines = []
-        for line in ocr_content.split('\n'):
-            if re.search(r'\d{2}/\d{2}/\d{4}', line):
-                date_lines.append(line)
+        date_lines = [line for line in ocr_content.split('\n') if DIAGNOSTIC_DATE_RE.search(line)]
         
         return {
             "total_characters": len(ocr_content),
@@ -464,13 +712,10 @@ async def test_ocr_extraction(file: UploadFile = File(...)):
         }
     
     finally:
-        if temp_pdf_path.exists():
-            temp_pdf_path.unlink()
+        remove_temp_file(temp_pdf_path)
 
 def parse_transactions_with_debug(raw_content: str, session_id: str) -> tuple:
     """Enhanced parsing with debugging info - MUCH SIMPLER!"""
-    from .parsing import parse_transactions  # Only need this one import now!
-    import pandas as pd
     
     parsing_details = {
         "strategy_used": "universal_parser",
@@ -499,34 +744,76 @@ def parse_transactions_with_debug(raw_content: str, session_id: str) -> tuple:
         parsing_details["error"] = str(e)
         raise
 
+def if_none_match_matches(if_none_match: Optional[str], opaque_tag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against an ETag's opaque tag
+    
+    Any listed tag matches whether it is sent weak (W/"...") or strong, and * matches everything
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque_tag:
+            return True
+    return False
+
+def file_download_response(request: Request, path: Path, filename: str, media_type: str) -> Response:
+    """
+    Serve an export file with an ETag and private caching, answering 304 when the client's copy matches
+    
+    The ETag comes from the file's stat (mtime and size), so the file is never read to build it
+    """
+    try:
+        stat_result = path.stat()
+    except FileNotFoundError:
+        logger.error(f"File not found: {path}")
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    # Weak, since the gzip middleware may send the same file under a different content-coding
+    opaque_tag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    etag = f'W/{opaque_tag}'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=600"}
+    
+    if if_none_match_matches(request.headers.get("if-none-match"), opaque_tag):
+        return Response(status_code=304, headers=headers)
+    
+    return FileResponse(
+        path=str(path),
+        filename=filename,
+        media_type=media_type,
+        headers=headers,
+        stat_result=stat_result
+    )
+
 @app.get("/download/{session_id}/excel")
-async def download_excel(session_id: str):
+async def download_excel(session_id: str, request: Request):
     """Download Excel file"""
     excel_path = TEMP_DIR / f"{session_id}_transactions.xlsx"
+    csv_path = TEMP_DIR / f"{session_id}_transactions.csv"
     
-    if not excel_path.exists():
-        logger.error(f"Excel file not found: {excel_path}")
-        raise HTTPException(status_code=404, detail="File not found")
+    # The workbook is built from the session's CSV the first time it is asked for
+    if not excel_path.exists() and csv_path.exists():
+        logger.info(f"Building Excel file for session {session_id}")
+        await run_in_process_pool(export_excel_from_csv, str(csv_path), str(excel_path))
     
     logger.info(f"Downloading Excel file for session {session_id}")
-    return FileResponse(
-        path=str(excel_path),
+    return file_download_response(
+        request,
+        excel_path,
         filename=f"bank_transactions_{session_id}.xlsx",
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
 @app.get("/download/{session_id}/csv")
-async def download_csv(session_id: str):
+async def download_csv(session_id: str, request: Request):
     """Download CSV file"""
     csv_path = TEMP_DIR / f"{session_id}_transactions.csv"
     
-    if not csv_path.exists():
-        logger.error(f"CSV file not found: {csv_path}")
-        raise HTTPException(status_code=404, detail="File not found")
-    
     logger.info(f"Downloading CSV file for session {session_id}")
-    return FileResponse(
-        path=str(csv_path),
+    return file_download_response(
+        request,
+        csv_path,
         filename=f"bank_transactions_{session_id}.csv",
         media_type="text/csv"
     )
@@ -534,155 +821,191 @@ async def download_csv(session_id: str):
 @app.get("/debug/{session_id}")
 async def get_debug_logs(session_id: str):
     """Get debug logs for a session"""
-    logs = debug_logs.get(session_id, [])
+    logs = session_debug_logs(session_id)
     return {"session_id": session_id, "logs": logs}
 
 @app.delete("/cleanup/{session_id}")
 async def cleanup_session(session_id: str):
     """Clean up temporary files and debug logs for a session"""
+    # Debug logs live in the session's temp files
     cleanup_temp_files(session_id, TEMP_DIR)
     
-    # Clean up debug logs
-    if session_id in debug_logs:
-        del debug_logs[session_id]
-    
     return {"message": "Files and logs cleaned up successfully"}
 
 # Add this to your main.py for debugging
 
-@app.post("/test-extraction")
-async def test_extraction(file: UploadFile = File(...)):
+def extract_page_diagnostics(pdf_path: str, page_num: int) -> tuple:
+    """Text and tables of one page (runs in a pool worker, which opens the PDF itself)"""
+    with pdfplumber.open(pdf_path) as pdf:
+        page = pdf.pages[page_num]
+        return page.extract_text(), page.extract_tables()
+
+def extract_diagnostic_pages(pdf_path: str) -> list:
+    """(text, tables) for every page, in page order, spread over the conversion workers"""
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+    
+    # Pages go to the pool a batch at a time, so a long diagnostic PDF never queues
+    # more than DIAGNOSTIC_PAGE_JOBS jobs ahead of the conversions sharing the workers
+    pool = get_process_pool()
+    page_results = []
+    for batch_start in range(0, page_count, DIAGNOSTIC_PAGE_JOBS):
+        batch = range(batch_start, min(batch_start + DIAGNOSTIC_PAGE_JOBS, page_count))
+        futures = [pool.submit(extract_page_diagnostics, pdf_path, page_num) for page_num in batch]
+        page_results.extend(future.result() for future in futures)
+    return page_results
+
+def analyze_extraction(temp_pdf_path: Path, session_id: str, filename: str) -> dict:
     """
-    Test extraction and parsing - returns detailed analysis
+    Blocking part of /test-extraction: extract, parse and save the detailed results
     """
-    session_id = str(uuid.uuid4())
-    temp_pdf_path = TEMP_DIR / f"{session_id}_input.pdf"
+    # Try different extraction methods
+    results = {
+        "session_id": session_id,
+        "filename": filename,
+        "extraction_methods": {}
+    }
     
+    # Pages are parsed once, in parallel across the worker pool; both methods below read the results
     try:
-        # Save uploaded file
-        content = await file.read()
-        with open(temp_pdf_path, "wb") as f:
-            f.write(content)
+        page_results = extract_diagnostic_pages(str(temp_pdf_path))
+        page_error = None
+    except Exception as e:
+        page_results = []
+        page_error = e
+    
+    # Method 1: PDFPlumber text extraction
+    try:
+        if page_error:
+            raise page_error
+        text_lines = []
+        for page_num, (text, _) in enumerate(page_results):
+            if text:
+                lines = text.split('\n')
+                for line in lines:
+                    if line.strip():
+                        text_lines.append({
+                            'page': page_num + 1,
+                            'line': line.strip()
+                        })
         
-        # Try different extraction methods
-        results = {
-            "session_id": session_id,
-            "filename": file.filename,
-            "extraction_methods": {}
+        results["extraction_methods"]["pdfplumber"] = {
+            "success": True,
+            "total_lines": len(text_lines),
+            "sample_lines": text_lines[:50],  # First 50 lines
+            "lines_with_dates": sum(1 for l in text_lines if DIAGNOSTIC_DATE_RE.search(l['line'])),
+            "lines_with_amounts": sum(1 for l in text_lines if DIAGNOSTIC_AMOUNT_RE.search(l['line']))
         }
+    except Exception as e:
+        results["extraction_methods"]["pdfplumber"] = {
+            "success": False,
+            "error": str(e)
+        }
+    
+    # Method 2: Try table extraction with pdfplumber
+    try:
+        if page_error:
+            raise page_error
+        all_tables = []
+        for page_num, (_, tables) in enumerate(page_results):
+            for table in tables:
+                if table:
+                    all_tables.append({
+                        'page': page_num + 1,
+                        'rows': len(table),
+                        'cols': len(table[0]) if table else 0,
+                        'sample': table[:5] if len(table) > 5 else table
+                    })
         
-        # Method 1: PDFPlumber text extraction
-        try:
-            import pdfplumber
-            text_lines = []
-            with pdfplumber.open(temp_pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        lines = text.split('\n')
-                        for line in lines:
-                            if line.strip():
-                                text_lines.append({
-                                    'page': page_num + 1,
-                                    'line': line.strip()
-                                })
-            
-            results["extraction_methods"]["pdfplumber"] = {
-                "success": True,
-                "total_lines": len(text_lines),
-                "sample_lines": text_lines[:50],  # First 50 lines
-                "lines_with_dates": sum(1 for l in text_lines if re.search(r'\d{2}/\d{2}/\d{4}', l['line'])),
-                "lines_with_amounts": sum(1 for l in text_lines if re.search(r'£?\d+\.\d{2}', l['line']))
-            }
-        except Exception as e:
-            results["extraction_methods"]["pdfplumber"] = {
-                "success": False,
-                "error": str(e)
-            }
-        
-        # Method 2: Try table extraction with pdfplumber
-        try:
-            import pdfplumber
-            all_tables = []
-            with pdfplumber.open(temp_pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    tables = page.extract_tables()
-                    for table in tables:
-                        if table:
-                            all_tables.append({
-                                'page': page_num + 1,
-                                'rows': len(table),
-                                'cols': len(table[0]) if table else 0,
-                                'sample': table[:5] if len(table) > 5 else table
-                            })
-            
-            results["extraction_methods"]["pdfplumber_tables"] = {
-                "success": True,
-                "tables_found": len(all_tables),
-                "table_info": all_tables
-            }
-        except Exception as e:
-            results["extraction_methods"]["pdfplumber_tables"] = {
-                "success": False,
-                "error": str(e)
-            }
+        results["extraction_methods"]["pdfplumber_tables"] = {
+            "success": True,
+            "tables_found": len(all_tables),
+            "table_info": all_tables
+        }
+    except Exception as e:
+        results["extraction_methods"]["pdfplumber_tables"] = {
+            "success": False,
+            "error": str(e)
+        }
+    
+    # Now test parsing
+    
+    # Get the best extracted content
+    raw_content = ""
+    if results["extraction_methods"].get("pdfplumber", {}).get("success"):
+        raw_content = '\n'.join([l['line'] for l in text_lines])
+    
+    if raw_content:
+        # Preprocess
+        processed_content = preprocess_content(raw_content)
         
-        # Now test parsing
-        from .parsing import parse_transactions, extract_all_transaction_lines, preprocess_content
+        # Try extraction
+        transactions = extract_all_transaction_lines(processed_content)
         
-        # Get the best extracted content
-        raw_content = ""
-        if results["extraction_methods"].get("pdfplumber", {}).get("success"):
-            raw_content = '\n'.join([l['line'] for l in text_lines])
+        results["parsing_results"] = {
+            "raw_content_length": len(raw_content),
+            "processed_content_length": len(processed_content),
+            "transactions_found": len(transactions),
+            "sample_transactions": transactions[:10] if transactions else [],
+            "content_preview": processed_content[:1000]  # First 1000 chars
+        }
         
-        if raw_content:
-            # Preprocess
-            processed_content = preprocess_content(raw_content)
-            
-            # Try extraction
-            transactions = extract_all_transaction_lines(processed_content)
-            
-            results["parsing_results"] = {
-                "raw_content_length": len(raw_content),
-                "processed_content_length": len(processed_content),
-                "transactions_found": len(transactions),
-                "sample_transactions": transactions[:10] if transactions else [],
-                "content_preview": processed_content[:1000]  # First 1000 chars
+        # Try full parsing
+        df = parse_transactions(raw_content)
+        if not df.empty:
+            results["dataframe_results"] = {
+                "rows": len(df),
+                "columns": list(df.columns),
+                "sample_data": df.head(10).to_dict('records')
             }
-            
-            # Try full parsing
-            df = parse_transactions(raw_content)
-            if not df.empty:
-                results["dataframe_results"] = {
-                    "rows": len(df),
-                    "columns": list(df.columns),
-                    "sample_data": df.head(10).to_dict('records')
-                }
+    
+    # Save detailed results to file
+    output_file = TEMP_DIR / f"{session_id}_debug.json"
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    
+    return results
+
+
+@app.post("/test-extraction")
+async def test_extraction(file: UploadFile = File(...)):
+    """
+    Test extraction and parsing - returns detailed analysis
+    """
+    session_id = new_session_id()
+    temp_pdf_path = TEMP_DIR / f"{session_id}_input.pdf"
+    
+    try:
+        # Save uploaded file
+        await save_upload_file(file, temp_pdf_path, check_pdf_header=True)
         
-        # Save detailed results to file
-        output_file = TEMP_DIR / f"{session_id}_debug.json"
-        with open(output_file, 'w') as f:
-            import json
-            json.dump(results, f, indent=2, default=str)
+        results = await run_diagnostic(analyze_extraction, temp_pdf_path, session_id, file.filename)
         
-        return JSONResponse(content=results)
+        return ORJSONResponse(content=results)
         
+    except HTTPException:
+        raise  # Rejected upload - keep its 400 rather than reporting a 500
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=500,
             content={"error": str(e), "traceback": traceback.format_exc()}
         )
     finally:
         # Cleanup
-        if temp_pdf_path.exists():
-            temp_pdf_path.unlink()
+        remove_temp_file(temp_pdf_path)
+
 
+def table_rows_to_text(df: pd.DataFrame) -> list:
+    """Each non-blank table row as its present cells joined by spaces, in row order"""
+    # Stacking drops the missing cells, so one grouped join replaces a per-row Python loop
+    cells = df.reset_index(drop=True).stack().dropna().astype(str)
+    row_texts = cells.groupby(level=0, sort=True).agg(' '.join)
+    return row_texts[row_texts.str.strip() != ''].tolist()
 
 def extract_with_camelot(pdf_path: str, session_id: str) -> str:
     """Try extraction with Camelot (specialized for tables)"""
     try:
         import camelot
-        import pandas as pd
         
         add_debug_log(session_id, "DEBUG", "Camelot: Reading tables from PDF")
         
@@ -695,10 +1018,7 @@ def extract_with_camelot(pdf_path: str, session_id: str) -> str:
             for table in tables:
                 if not table.df.empty:
                     # Convert table to text line by line
-                    for _, row in table.df.iterrows():
-                        row_text = ' '.join(str(cell) for cell in row if pd.notna(cell))
-                        if row_text.strip():
-                            all_text.append(row_text)
+                    all_text.extend(table_rows_to_text(table.df))
             add_debug_log(session_id, "DEBUG", f"Camelot lattice: found {len(tables)} tables")
         except Exception as e:
             add_debug_log(session_id, "DEBUG", f"Camelot lattice failed: {str(e)}")
@@ -709,10 +1029,7 @@ def extract_with_camelot(pdf_path: str, session_id: str) -> str:
                 tables = camelot.read_pdf(pdf_path, pages='all', flavor='stream')
                 for table in tables:
                     if not table.df.empty:
-                        for _, row in table.df.iterrows():
-                            row_text = ' '.join(str(cell) for cell in row if pd.notna(cell))
-                            if row_text.strip():
-                                all_text.append(row_text)
+                        all_text.extend(table_rows_to_text(table.df))
                 add_debug_log(session_id, "DEBUG", f"Camelot stream: found {len(tables)} tables")
             except Exception as e:
                 add_debug_log(session_id, "DEBUG", f"Camelot stream failed: {str(e)}")
@@ -732,7 +1049,6 @@ def extract_with_tabula(pdf_path: str, session_id: str) -> str:
     """Try extraction with Tabula (Java-based table extractor)"""
     try:
         import tabula
-        import pandas as pd
         
         add_debug_log(session_id, "DEBUG", "Tabula: Reading tables from PDF")
         
@@ -743,10 +1059,7 @@ def extract_with_tabula(pdf_path: str, session_id: str) -> str:
         for df in dfs:
             if not df.empty:
                 # Convert each table row to text
-                for _, row in df.iterrows():
-                    row_text = ' '.join(str(cell) for cell in row if pd.notna(cell))
-                    if row_text.strip():
-                        all_text.append(row_text)
+                all_text.extend(table_rows_to_text(df))
         
         result = '\n'.join(all_text)
         add_debug_log(session_id, "INFO", f"Tabula: Extracted {len(all_text)} lines from {len(dfs)} tables")
@@ -768,38 +1081,53 @@ async def startup_event():
     logger.info(f"Log level: {log_level}")
     logger.info(f"Environment: {os.environ.get('RAILWAY_ENVIRONMENT', 'development')}")
     
-    # Check dependencies
-    try:
-        import pytesseract
-        tesseract_version = pytesseract.get_tesseract_version()
-        logger.info(f"Tesseract available: {tesseract_version}")
-    except Exception as e:
-        logger.error(f"Tesseract not available: {str(e)}")
+    # Check dependencies (the result is reused by /health)
+    logger.info(f"Tesseract: {tesseract_status()}")
     
-    # Clean old temp files
-    for old_file in TEMP_DIR.glob("*"):
-        if old_file.is_file():
-            try:
-                age = time.time() - old_file.stat().st_mtime
-                if age > 3600:  # 1 hour old
-                    old_file.unlink()
-                    logger.debug(f"Cleaned old file: {old_file}")
-            except Exception as e:
-                logger.warning(f"Could not clean {old_file}: {str(e)}")
+    # Clean old temp files in the background so startup is not blocked
+    global temp_sweep_task
+    temp_sweep_task = asyncio.create_task(sweep_temp_files_periodically())
+    
+    # Start the conversion workers ahead of traffic, so the first uploads don't wait for
+    # worker processes to spawn and import pandas/pdfplumber
+    pool = get_process_pool()
+    for _ in range(CONVERT_WORKERS):
+        pool.submit(warm_up_worker)
     
     logger.info("Startup complete")
+
+async def sweep_temp_files_periodically():
+    """Remove expired temp files now and every TEMP_SWEEP_INTERVAL_SECONDS after"""
+    while True:
+        await asyncio.to_thread(cleanup_old_temp_files, TEMP_DIR, TEMP_FILE_MAX_AGE_HOURS)
+        await asyncio.sleep(TEMP_SWEEP_INTERVAL_SECONDS)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the temp file sweep and conversion workers"""
+    if temp_sweep_task is not None:
+        temp_sweep_task.cancel()
     
+    if process_pool is not None:
+        process_pool.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", "8000"))
     
+    # Session state (uploads, exports, debug logs) lives in TEMP_DIR, so workers can be
+    # scaled out; each one has its own conversion pool, hence the default of 1
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    
     # Use INFO level for production
     uvicorn.run(
-        app,
+        "app.main:app",  # Import string, required for multiple workers
         host="0.0.0.0",
         port=port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
         proxy_headers=True,
-        log_level="debug",  # Changed from debug/info
+        log_level="info",
         access_log=True,  # Disable access logs in production or True
     )
\ No newline at end of file
@@ -2,11 +2,59 @@
 import pandas as pd
 import re
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 from typing import List, Dict, Any, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+TRANSACTION_COLUMNS = ['date', 'description', 'debit', 'credit', 'balance']
+AMOUNT_COLUMNS = ['debit', 'credit', 'balance']
+
+# Anything every supported date format starts with ("31/07", "31-07", "31 Jul", "31Jul") -
+# content without a match cannot contain a transaction for any strategy
+DATE_HINT_RE = re.compile(r'\d\s*[/-]\s*\d|\d\s*[A-Za-z]{3}')
+
+# Patterns are compiled once at import rather than looked up in the re cache per line
+
+# Common OCR confusions fixed before parsing
+OCR_REPLACEMENTS = [
+    (re.compile(r'[Il|](\d)'), r'1\1'),  # I/l/| followed by digit -> 1
+    (re.compile(r'(\d)[Il|]'), r'\g<1>1'),  # digit followed by I/l/| -> 1
+    (re.compile(r'[Oo](\d)'), r'0\1'),  # O followed by digit -> 0
+    (re.compile(r'(\d)[Oo]'), r'\g<1>0'),  # digit followed by O -> 0
+    (re.compile(r'£\s+'), '£'),  # Remove spaces after £
+    (re.compile(r'(\d)\s+\.\s*(\d)'), r'\1.\2'),  # Fix decimal spacing
+    (re.compile(r'(\d),\s*(\d{3})'), r'\1,\2'),  # Fix thousand separator
+]
+
+# UK date formats, with the strptime format each one is parsed with
+DATE_PATTERNS = [
+    (re.compile(r'(\d{2}/\d{2}/\d{4})'), '%d/%m/%Y'),  # 31/07/2025
+    (re.compile(r'(\d{2}-\d{2}-\d{4})'), '%d-%m-%Y'),  # 31-07-2025
+    (re.compile(r'(\d{2}/\d{2}/\d{2})'), '%d/%m/%y'),  # 31/07/25
+    (re.compile(r'(\d{2}\s+\w{3}\s+\d{4})'), '%d %b %Y'),  # 31 Jul 2025
+    (re.compile(r'(\d{2}\w{3}\d{2})'), '%d%b%y'),  # 31Jul25
+]
+
+NUMERIC_DATE_RE = re.compile(r'(\d{2}[/-]\d{2}[/-]\d{2,4})')
+DAY_MONTH_RE = re.compile(r'\d{2}[/-]\d{2}')
+DECIMAL_AMOUNT_RE = re.compile(r'-?\d+\.\d{2}')
+AMOUNT_RE = re.compile(r'-?£?\d+(?:,\d{3})*\.?\d{0,2}')
+EDGE_NON_WORD_RE = re.compile(r'^\W+|\W+$')
+WHITESPACE_RE = re.compile(r'\s+')
+BLOCK_SEPARATOR_RE = re.compile(r'\n\s*\n')
+
+# Column header names, matched against the lower-cased header line
+COLUMN_HEADER_PATTERNS = {
+    'date': re.compile(r'(date|transaction date)'),
+    'description': re.compile(r'(description|details|merchant|payee)'),
+    'debit': re.compile(r'(debit|money out|out)'),
+    'credit': re.compile(r'(credit|money in|in)'),
+    'balance': re.compile(r'(balance|running balance)')
+}
+
 def parse_transactions(raw_content: str) -> pd.DataFrame:
     """
     Universal bank statement parser for UK banks
@@ -15,6 +63,11 @@ def parse_transactions(raw_content: str) -> pd.DataFrame:
         # Clean content first
         content = preprocess_content(raw_content)
         
+        # Cheap sniff before running the full-scan strategies
+        if not DATE_HINT_RE.search(content):
+            logger.warning("No date-like text found, skipping transaction extraction")
+            return pd.DataFrame()
+        
         # Extract all potential transaction lines
         all_transactions = []
         
@@ -40,17 +93,14 @@ def parse_transactions(raw_content: str) -> pd.DataFrame:
             logger.warning("No transactions found")
             return pd.DataFrame()
         
-        # Convert to DataFrame and clean
-        df = pd.DataFrame(all_transactions)
-        df = clean_and_validate_transactions(df)
+        # Clean the records, then convert to a DataFrame once
+        df = clean_and_validate_transactions(all_transactions)
         
         logger.info(f"Successfully parsed {len(df)} transactions")
         return df
         
     except Exception as e:
-        logger.error(f"Error parsing transactions: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.error(f"Error parsing transactions: {str(e)}", exc_info=True)
         return pd.DataFrame()
 
 def preprocess_content(content: str) -> str:
@@ -61,18 +111,8 @@ def preprocess_content(content: str) -> str:
         return ""
     
     # Fix common OCR issues
-    replacements = {
-        r'[Il|](\d)': r'1\1',  # I/l/| followed by digit -> 1
-        r'(\d)[Il|]': r'\11',  # digit followed by I/l/| -> 1
-        r'[Oo](\d)': r'0\1',  # O followed by digit -> 0
-        r'(\d)[Oo]': r'\10',  # digit followed by O -> 0
-        r'£\s+': '£',  # Remove spaces after £
-        r'(\d)\s+\.\s*(\d)': r'\1.\2',  # Fix decimal spacing
-        r'(\d),\s*(\d{3})': r'\1,\2',  # Fix thousand separator
-    }
-    
-    for pattern, replacement in replacements.items():
-        content = re.sub(pattern, replacement, content)
+    for pattern, replacement in OCR_REPLACEMENTS:
+        content = pattern.sub(replacement, content)
     
     return content
 
@@ -95,17 +135,9 @@ def extract_all_transaction_lines(content: str) -> List[Dict[str, Any]]:
             continue
         
         # Look for UK date formats
-        date_patterns = [
-            (r'(\d{2}/\d{2}/\d{4})', '%d/%m/%Y'),  # 31/07/2025
-            (r'(\d{2}-\d{2}-\d{4})', '%d-%m-%Y'),  # 31-07-2025
-            (r'(\d{2}/\d{2}/\d{2})', '%d/%m/%y'),  # 31/07/25
-            (r'(\d{2}\s+\w{3}\s+\d{4})', '%d %b %Y'),  # 31 Jul 2025
-            (r'(\d{2}\w{3}\d{2})', '%d%b%y'),  # 31Jul25
-        ]
-        
         transaction = None
-        for date_pattern, date_format in date_patterns:
-            date_match = re.search(date_pattern, line)
+        for date_pattern, date_format in DATE_PATTERNS:
+            date_match = date_pattern.search(line)
             if date_match:
                 date_str = date_match.group(1)
                 parsed_date = parse_date_flexible(date_str, date_format)
@@ -124,11 +156,11 @@ def extract_all_transaction_lines(content: str) -> List[Dict[str, Any]]:
         if not transaction and i < len(lines) - 1:
             # Check if next line has amounts but no date (continuation)
             next_line = lines[i + 1].strip()
-            if re.search(r'-?\d+\.\d{2}', next_line) and not re.search(r'\d{2}[/-]\d{2}', next_line):
+            if DECIMAL_AMOUNT_RE.search(next_line) and not DAY_MONTH_RE.search(next_line):
                 # Combine lines and retry
                 combined = line + ' ' + next_line
-                for date_pattern, date_format in date_patterns:
-                    date_match = re.search(date_pattern, combined)
+                for date_pattern, date_format in DATE_PATTERNS:
+                    date_match = date_pattern.search(combined)
                     if date_match:
                         date_str = date_match.group(1)
                         parsed_date = parse_date_flexible(date_str, date_format)
@@ -150,10 +182,9 @@ def extract_transaction_from_line(line: str, date_str: str, parsed_date: str,
     Extract transaction details from a line that contains a date
     """
     # Find all monetary amounts in the line
-    amount_pattern = r'-?£?\d+(?:,\d{3})*\.?\d{0,2}'
     amounts = []
     
-    for match in re.finditer(amount_pattern, line):
+    for match in AMOUNT_RE.finditer(line):
         amount_str = match.group()
         # Clean and convert
         amount_str = amount_str.replace('£', '').replace(',', '')
@@ -183,8 +214,8 @@ def extract_transaction_from_line(line: str, date_str: str, parsed_date: str,
     description = line[desc_start:desc_end].strip()
     
     # Clean description
-    description = re.sub(r'^\W+|\W+$', '', description)  # Remove leading/trailing non-word chars
-    description = re.sub(r'\s+', ' ', description)  # Normalize whitespace
+    description = EDGE_NON_WORD_RE.sub('', description)  # Remove leading/trailing non-word chars
+    description = WHITESPACE_RE.sub(' ', description)  # Normalize whitespace
     
     # If description is too short, try to find more text
     if len(description) < 3 and amounts:
@@ -301,7 +332,7 @@ def extract_block_transactions(content: str) -> List[Dict[str, Any]]:
     transactions = []
     
     # Split by double newlines or other block separators
-    blocks = re.split(r'\n\s*\n', content)
+    blocks = BLOCK_SEPARATOR_RE.split(content)
     
     for block in blocks:
         block = block.strip()
@@ -309,7 +340,7 @@ def extract_block_transactions(content: str) -> List[Dict[str, Any]]:
             continue
         
         # Check if block contains transaction-like content
-        if not re.search(r'\d{2}[/-]\d{2}', block):  # No date
+        if not DAY_MONTH_RE.search(block):  # No date
             continue
         
         # Try to parse as single transaction
@@ -320,7 +351,7 @@ def extract_block_transactions(content: str) -> List[Dict[str, Any]]:
         date_parsed = None
         
         for line in lines:
-            date_match = re.search(r'(\d{2}[/-]\d{2}[/-]\d{2,4})', line)
+            date_match = NUMERIC_DATE_RE.search(line)
             if date_match:
                 date_parsed = parse_date_flexible(date_match.group(1), None)
                 date_line = line
@@ -335,7 +366,7 @@ def extract_block_transactions(content: str) -> List[Dict[str, Any]]:
         
         for line in lines:
             # Get amounts
-            amt_matches = re.findall(r'-?£?\d+(?:,\d{3})*\.?\d{0,2}', line)
+            amt_matches = AMOUNT_RE.findall(line)
             for amt_str in amt_matches:
                 clean_amt = amt_str.replace('£', '').replace(',', '')
                 try:
@@ -346,8 +377,8 @@ def extract_block_transactions(content: str) -> List[Dict[str, Any]]:
                     pass
             
             # Get text that might be description
-            clean_line = re.sub(r'-?£?\d+(?:,\d{3})*\.?\d{0,2}', '', line).strip()
-            clean_line = re.sub(r'\d{2}[/-]\d{2}[/-]\d{2,4}', '', clean_line).strip()
+            clean_line = AMOUNT_RE.sub('', line).strip()
+            clean_line = NUMERIC_DATE_RE.sub('', clean_line).strip()
             if clean_line and len(clean_line) > 2:
                 description_parts.append(clean_line)
         
@@ -382,16 +413,8 @@ def detect_column_positions(header_line: str) -> Dict[str, Tuple[int, int]]:
     header_lower = header_line.lower()
     
     # Find column headers and their positions
-    patterns = {
-        'date': r'(date|transaction date)',
-        'description': r'(description|details|merchant|payee)',
-        'debit': r'(debit|money out|out)',
-        'credit': r'(credit|money in|in)',
-        'balance': r'(balance|running balance)'
-    }
-    
-    for col_name, pattern in patterns.items():
-        match = re.search(pattern, header_lower)
+    for col_name, pattern in COLUMN_HEADER_PATTERNS.items():
+        match = pattern.search(header_lower)
         if match:
             columns[col_name] = match.span()
     
@@ -452,9 +475,12 @@ def create_transaction_from_columns(values: Dict[str, str],
     
     return transaction if transaction['date'] else None
 
+@lru_cache(maxsize=4096)
 def parse_date_flexible(date_str: str, hint_format: Optional[str] = None) -> Optional[str]:
     """
     Flexible date parser that tries multiple formats
+    
+    Cached, since a statement repeats the same few dates and each miss costs a strptime per format
     """
     if not date_str:
         return None
@@ -490,38 +516,49 @@ def parse_date_flexible(date_str: str, hint_format: Optional[str] = None) -> Opt
     
     return None
 
-def clean_and_validate_transactions(df: pd.DataFrame) -> pd.DataFrame:
+def clean_and_validate_transactions(transactions: List[Dict[str, Any]]) -> pd.DataFrame:
     """
-    Clean and validate the transactions DataFrame
-    """
-    if df.empty:
-        return df
-    
-    # Ensure required columns
-    required_cols = ['date', 'description', 'debit', 'credit', 'balance']
-    for col in required_cols:
-        if col not in df.columns:
-            df[col] = None
-    
-    # Remove invalid rows
-    df = df[df['date'].notna()]  # Must have a date
+    Clean and validate parsed transactions, returning them as a DataFrame
     
-    # Clean descriptions
-    df['description'] = df['description'].fillna('Transaction')
-    df['description'] = df['description'].str.strip()
-    df['description'] = df['description'].str.replace(r'\s+', ' ', regex=True)
-    
-    # Ensure numeric columns are float
-    for col in ['debit', 'credit', 'balance']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    Works on the plain records and builds the DataFrame once at the end, instead of
+    filtering, sorting and de-duplicating a series of intermediate DataFrames
+    """
+    cleaned = []
+    for transaction in transactions:
+        # Must have a date
+        if transaction.get('date') is None:
+            continue
+        
+        description = transaction.get('description')
+        if description is None:
+            description = 'Transaction'
+        
+        cleaned.append({
+            'date': transaction['date'],
+            'description': ' '.join(str(description).split()),  # Strip and collapse whitespace
+            **{col: to_amount(transaction.get(col)) for col in AMOUNT_COLUMNS}
+        })
     
-    # Sort by date
-    df = df.sort_values('date', na_position='last')
+    # Sort by date (a stable sort, so same-day transactions keep their statement order)
+    cleaned.sort(key=itemgetter('date'))
     
     # Remove duplicates (same date, description, and amounts)
-    df = df.drop_duplicates(subset=['date', 'description', 'debit', 'credit'], keep='first')
-    
-    # Reset index
-    df = df.reset_index(drop=True)
-    
-    return df
\ No newline at end of file
+    seen = set()
+    unique = []
+    for transaction in cleaned:
+        key = (transaction['date'], transaction['description'], transaction['debit'], transaction['credit'])
+        if key not in seen:
+            seen.add(key)
+            unique.append(transaction)
+    
+    df = pd.DataFrame(unique, columns=TRANSACTION_COLUMNS)
+    return df.astype({col: float for col in AMOUNT_COLUMNS})
+
+def to_amount(value: Any) -> Optional[float]:
+    """
+    Convert a parsed amount to float, or None if it is missing or not numeric
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
\ No newline at end of file
@@ -8,27 +8,30 @@ from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Extensions of the per-session temp files (upload, exports and debug log)
+SESSION_FILE_SUFFIXES = ('.pdf', '.xlsx', '.csv', '.jsonl')
+
 def cleanup_temp_files(session_id: str, temp_dir: Path, max_age_hours: int = 24):
     """
     Clean up temporary files for a session
     """
     try:
-        # Remove files for specific session
-        patterns = [
-            f"{session_id}_*.pdf",
-            f"{session_id}_*.xlsx", 
-            f"{session_id}_*.csv"
-        ]
+        # Remove files for specific session - one directory scan rather than a glob per pattern
+        prefix = f"{session_id}_"
+        with os.scandir(temp_dir) as entries:
+            session_paths = [
+                entry.path for entry in entries
+                if entry.name.startswith(prefix) and entry.name.endswith(SESSION_FILE_SUFFIXES)
+            ]
         
         files_removed = 0
-        for pattern in patterns:
-            for file_path in temp_dir.glob(pattern):
-                try:
-                    file_path.unlink()
-                    files_removed += 1
-                    logger.debug(f"Removed temp file: {file_path}")
-                except Exception as e:
-                    logger.warning(f"Could not remove temp file {file_path}: {str(e)}")
+        for file_path in session_paths:
+            try:
+                os.unlink(file_path)
+                files_removed += 1
+                logger.debug("Removed temp file: %s", file_path)
+            except Exception as e:
+                logger.warning(f"Could not remove temp file {file_path}: {str(e)}")
         
         logger.info(f"Cleaned up {files_removed} temp files for session {session_id}")
         
@@ -43,20 +46,25 @@ def cleanup_old_temp_files(temp_dir: Path, max_age_hours: int = 24):
     Clean up old temporary files from all sessions
     """
     try:
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
-        files_removed = 0
+        cutoff = time.time() - max_age_hours * 3600
         
-        for file_path in temp_dir.iterdir():
-            if file_path.is_file():
-                try:
-                    file_age = current_time - file_path.stat().st_mtime
-                    if file_age > max_age_seconds:
-                        file_path.unlink()
-                        files_removed += 1
-                        logger.debug(f"Removed old temp file: {file_path}")
-                except Exception as e:
-                    logger.warning(f"Could not remove old temp file {file_path}: {str(e)}")
+        # One directory scan (entry types come with the listing), then unlink the expired files
+        with os.scandir(temp_dir) as entries:
+            stale_paths = [
+                entry.path for entry in entries
+                if entry.is_file() and entry.stat().st_mtime < cutoff
+            ]
+        
+        files_removed = 0
+        for file_path in stale_paths:
+            try:
+                os.unlink(file_path)
+                files_removed += 1
+                logger.debug("Removed old temp file: %s", file_path)
+            except FileNotFoundError:
+                pass  # Already removed by another cleanup
+            except Exception as e:
+                logger.warning(f"Could not remove old temp file {file_path}: {str(e)}")
         
         if files_removed > 0:
             logger.info(f"Cleaned up {files_removed} old temp files")
@@ -64,6 +72,18 @@ def cleanup_old_temp_files(temp_dir: Path, max_age_hours: int = 24):
     except Exception as e:
         logger.error(f"Error cleaning up old temp files: {str(e)}")
 
+def remove_temp_file(file_path: Path):
+    """
+    Remove a single temp file if it is still there
+    """
+    try:
+        file_path.unlink()
+        logger.debug("Removed temp file: %s", file_path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Could not remove temp file {file_path}: {str(e)}")
+
 def get_file_size(file_path: str) -> Optional[int]:
     """
     Get file size in bytes
@@ -263,7 +283,7 @@ def check_dependencies():
     for dep, description in dependencies.items():
         try:
             __import__(dep)
-            logger.debug(f"✓ {dep} - {description}")
+            logger.debug("✓ %s - %s", dep, description)
         except ImportError:
             missing_deps.append(f"{dep} - {description}")
             logger.error(f"✗ Missing: {dep} - {description}")
@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+import sys
+from pathlib import Path
+
+# Make the app package importable when pytest is run from the repo root or backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
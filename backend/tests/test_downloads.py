@@ -0,0 +1,18 @@
+# backend/tests/test_downloads.py
+from app.main import if_none_match_matches
+
+TAG = '"18dee38d005ce744-4dc"'
+
+def test_if_none_match_accepts_weak_and_strong_forms():
+    assert if_none_match_matches(f"W/{TAG}", TAG)
+    assert if_none_match_matches(TAG, TAG)
+
+def test_if_none_match_accepts_lists_and_wildcard():
+    assert if_none_match_matches(f'W/"other", W/{TAG}', TAG)
+    assert if_none_match_matches(f'"other",{TAG}', TAG)
+    assert if_none_match_matches("*", TAG)
+
+def test_if_none_match_rejects_other_tags():
+    assert not if_none_match_matches(None, TAG)
+    assert not if_none_match_matches("", TAG)
+    assert not if_none_match_matches('W/"other", "another"', TAG)
@@ -0,0 +1,41 @@
+# backend/tests/test_upload_limit.py
+from fastapi.testclient import TestClient
+
+from app.main import app, ContentSizeLimitMiddleware
+
+LIMIT = 1024 * 1024
+BOUNDARY = "limit-test"
+
+def oversized_upload() -> bytes:
+    """A multipart body with one PDF part just over LIMIT"""
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="big.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + b"%PDF-" + b"0" * LIMIT + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def limited_client() -> TestClient:
+    """The app behind a 1 MB limit (lifespan not started, so no worker pool)"""
+    return TestClient(ContentSizeLimitMiddleware(app, max_size=LIMIT))
+
+def test_declared_content_length_over_limit_is_rejected():
+    response = limited_client().post(
+        "/convert",
+        content=oversized_upload(),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    
+    assert response.status_code == 413
+    assert response.json() == {"error": True, "message": "File too large (limit 1 MB)"}
+
+def test_chunked_body_over_limit_is_rejected_with_the_same_body():
+    body = oversized_upload()
+    chunks = (body[i:i + 64 * 1024] for i in range(0, len(body), 64 * 1024))
+    response = limited_client().post(
+        "/convert",
+        content=chunks,
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    
+    assert response.status_code == 413
+    assert response.json() == {"error": True, "message": "File too large (limit 1 MB)"}
@@ -70,8 +70,7 @@ export default function DebugPanel({ logs, errorDetails, result, onClose }: Debu
   const hasRawContent = rawContent.length > 0
   
   // Get extracted text from extraction details
-  const extractedText = result?.extraction_details?.all_extracted_text || 
-                        result?.extraction_details?.raw_text_preview || ''
+  const extractedText = result?.extraction_details?.all_extracted_text || ''
   const hasExtractedText = extractedText.length > 0
 
   return (